@@ -0,0 +1,146 @@
+"""Синтетический каталог фильмов, жанров и персон для нагрузочных тестов.
+
+Каталог детерминирован: при одинаковых размерах и seed получаются одни и те же
+документы, поэтому результаты прогонов на разных коммитах сравнимы. Документы
+повторяют структуру индексов movies, genres и persons.
+"""
+
+import random
+import uuid
+from dataclasses import dataclass, field
+
+GENRE_NAMES = [
+    "Action", "Adventure", "Animation", "Biography", "Comedy", "Crime",
+    "Documentary", "Drama", "Family", "Fantasy", "History", "Horror", "Music",
+    "Musical", "Mystery", "News", "Reality-TV", "Romance", "Sci-Fi", "Short",
+    "Sport", "Talk-Show", "Thriller", "War", "Western", "Game-Show",
+]  # fmt: skip
+
+FIRST_NAMES = [
+    "Anna", "Boris", "Clara", "David", "Elena", "Felix", "Greta", "Hugo",
+    "Irene", "Jakob", "Karin", "Leon", "Maria", "Nikolai", "Olga", "Pavel",
+    "Quinn", "Rosa", "Stefan", "Tamara", "Ulrich", "Vera", "Walter", "Xenia",
+    "Yuri", "Zoya", "Adam", "Bella", "Carl", "Dora", "Emil", "Fiona", "Gleb",
+    "Hanna", "Igor", "Julia", "Kirill", "Lidia", "Mark", "Nina", "Oscar",
+    "Polina", "Roman", "Sofia", "Timur", "Uma", "Victor", "Wanda", "Yana",
+    "Zakhar", "Alice", "Bruno", "Celine", "Denis", "Eva", "Frank", "Gloria",
+    "Harry", "Ida", "James", "Kate", "Luke", "Mila", "Noah", "Olivia", "Peter",
+    "Rita", "Sam", "Tina", "Vadim", "Wilma", "Yasmin", "Zara", "Arthur",
+    "Berta", "Chris", "Diana", "Erik", "Flora", "George", "Helen", "Ivan",
+    "Jane", "Kevin", "Laura", "Max", "Nora", "Otto", "Paula", "Ralph",
+    "Sara", "Tom", "Ursula", "Vlad", "Wendy", "Yves", "Zeno", "Agnes",
+    "Bernard", "Cora",
+]  # fmt: skip
+
+LAST_NAMES = [
+    "Abbott", "Baker", "Carter", "Dalton", "Ellis", "Fisher", "Garcia",
+    "Harper", "Ingram", "Jensen", "Keller", "Lambert", "Morozov", "Novak",
+    "Orlov", "Petrov", "Quincy", "Romanov", "Sokolov", "Turner", "Ulyanov",
+    "Volkov", "Walker", "Yakovlev", "Zaitsev", "Adler", "Brooks", "Cole",
+    "Dunn", "Evans", "Frost", "Gray", "Hayes", "Irwin", "Jordan", "Knight",
+    "Lowe", "Mason", "Nash", "Owen", "Parker", "Reed", "Stone", "Tate",
+    "Vance", "Wolfe", "York", "Zimmer", "Archer", "Bishop", "Crane", "Drake",
+    "Egorov", "Fedorov", "Grant", "Holt", "Ivanov", "Jacobs", "Kuznetsov",
+    "Lebedev", "Miller", "Nikitin", "Olsen", "Popov", "Rivers", "Smirnov",
+    "Thorne", "Usov", "Vasiliev", "Webb", "Yates", "Zorin", "Austin", "Black",
+    "Cross", "Doyle", "Engel", "Ford", "Gibson", "Hart", "Ilyin", "Jones",
+    "Kane", "Lynch", "Moore", "North", "Osipov", "Price", "Ross", "Shaw",
+    "Todd", "Underwood", "Voss", "West", "Young", "Zhukov", "Andersen",
+    "Berg", "Chase", "Dixon", "Emerson", "Foster", "Glover", "Hill", "Isaacs",
+    "Jarvis", "Kent", "Little", "Morgan", "Noble", "Oakley", "Pike", "Rowe",
+    "Sharp", "Tucker", "Upton", "Vaughn", "Wells",
+]  # fmt: skip
+
+WORDS = [
+    "star", "night", "river", "shadow", "city", "dream", "storm", "heart",
+    "ghost", "empire", "winter", "summer", "road", "fire", "ice", "secret",
+    "garden", "island", "mirror", "silence", "hunter", "king", "queen",
+    "machine", "ocean", "mountain", "desert", "forest", "journey", "war",
+    "peace", "love", "time", "space", "world", "light", "dark", "last",
+    "first", "lost", "return", "rise", "fall", "edge", "code", "signal",
+    "echo", "wolf", "raven", "crown", "blade", "stone", "glass", "paper",
+    "iron", "gold", "silver", "planet", "galaxy", "station", "harbor",
+    "village", "castle", "tower", "bridge", "train", "ship", "voyage",
+    "legend", "myth", "promise", "memory", "future", "past", "escape",
+    "hope", "fear", "truth", "lie", "game", "rule", "order", "chaos",
+    "spirit", "soul", "blood", "moon", "sun", "wind", "rain", "snow",
+    "thunder", "spark", "flame", "smoke", "dust", "sand", "wave", "tide",
+]  # fmt: skip
+
+
+def make_uuid(rng: random.Random) -> str:
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+@dataclass
+class Catalogue:
+    films: list[dict] = field(default_factory=list)
+    genres: list[dict] = field(default_factory=list)
+    persons: list[dict] = field(default_factory=list)
+
+    def indexes(self) -> dict[str, list[dict]]:
+        return {"movies": self.films, "genres": self.genres, "persons": self.persons}
+
+
+def skewed_index(rng: random.Random, size: int, skew: float = 2.0) -> int:
+    """Номер элемента с перекосом к началу списка. Так небольшая часть персон
+    участвует в большом числе фильмов, а запросы чаще приходятся на популярные
+    фильмы и персоны"""
+
+    return min(int(size * rng.random() ** skew), size - 1)
+
+
+def build_catalogue(films: int, persons: int, seed: int = 42) -> Catalogue:
+    rng = random.Random(seed)
+    catalogue = Catalogue()
+
+    catalogue.genres = [{"id": make_uuid(rng), "name": name} for name in GENRE_NAMES]
+
+    initials = [chr(code) for code in range(ord("A"), ord("Z") + 1)]
+    names = set()
+    while len(catalogue.persons) < persons:
+        name = (
+            f"{rng.choice(FIRST_NAMES)} {rng.choice(initials)}. "
+            f"{rng.choice(LAST_NAMES)}"
+        )
+        if name in names:
+            if len(names) >= len(FIRST_NAMES) * len(initials) * len(LAST_NAMES):
+                raise ValueError(f"Нельзя создать {persons} персон с разными именами")
+            continue
+        names.add(name)
+        catalogue.persons.append({"id": make_uuid(rng), "full_name": name})
+
+    for _ in range(films):
+        roles = {}
+        for role, count in (("actors", 4), ("writers", 2), ("directors", 1)):
+            people = {
+                skewed_index(rng, len(catalogue.persons))
+                for _ in range(rng.randint(1, count))
+            }
+            roles[role] = [
+                {
+                    "id": catalogue.persons[position]["id"],
+                    "name": catalogue.persons[position]["full_name"],
+                }
+                for position in sorted(people)
+            ]
+
+        catalogue.films.append(
+            {
+                "id": make_uuid(rng),
+                "title": " ".join(rng.sample(WORDS, rng.randint(1, 4))).title(),
+                "description": " ".join(rng.choices(WORDS, k=rng.randint(8, 20))),
+                "imdb_rating": round(rng.uniform(1.0, 9.9), 1),
+                "genres": [
+                    genre["name"]
+                    for genre in rng.sample(catalogue.genres, rng.randint(1, 3))
+                ],
+                **roles,
+                **{
+                    f"{role}_names": [person["name"] for person in people]
+                    for role, people in roles.items()
+                },
+            }
+        )
+
+    return catalogue
@@ -0,0 +1,396 @@
+"""Замена AsyncElasticsearch для нагрузочных тестов.
+
+Поддерживает только те запросы, которые строят сервисы API: get, mget,
+search (match_all, terms, ids, match, multi_match, bool/should,
+more_like_this, function_score, сортировка, from/size, search_after,
+_source) и msearch. Поиск по тексту упрощен: документ подходит, если содержит
+все слова запроса, без морфологии и нечеткого сравнения. Каждый вызов
+выдерживает заданную задержку, чтобы моделировать время ответа кластера.
+"""
+
+import asyncio
+import bisect
+import math
+import random
+import re
+from collections import Counter, defaultdict
+from typing import Any, Iterable
+
+import orjson
+from elastic_transport import ApiResponseMeta, HttpHeaders, NodeConfig
+from elasticsearch import NotFoundError
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+# Поля, значения которых сравниваются целиком (keyword), а не по словам
+KEYWORD_FIELDS = {
+    "movies": ("id", "genres", "actors_names", "writers_names", "directors_names"),
+    "genres": ("id", "name"),
+    "persons": ("id",),
+}
+TEXT_FIELDS = {
+    "movies": (
+        "title",
+        "description",
+        "actors_names",
+        "writers_names",
+        "directors_names",
+    ),
+    "genres": ("name",),
+    "persons": ("full_name",),
+}
+
+
+def tokenize(text: Any) -> list[str]:
+    return TOKEN_PATTERN.findall(str(text).lower())
+
+
+def _values(value: Any) -> list:
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def _not_found(message: str) -> NotFoundError:
+    meta = ApiResponseMeta(
+        status=404,
+        http_version="1.1",
+        headers=HttpHeaders(),
+        duration=0.0,
+        node=NodeConfig("http", "localhost", 9200),
+    )
+    return NotFoundError(message, meta, {"found": False})
+
+
+class _Descending:
+    """Обертка значения для сортировки по убыванию в общем порядке ключей"""
+
+    __slots__ = ("value",)
+
+    def __init__(self, value: Any):
+        self.value = value
+
+    def __lt__(self, other: "_Descending") -> bool:
+        return other.value < self.value
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, _Descending) and self.value == other.value
+
+
+class FakeIndex:
+    def __init__(self, name: str, documents: list[dict]):
+        self.name = name
+        self.documents = {document["id"]: document for document in documents}
+        self.keywords: dict[str, dict[Any, set[str]]] = defaultdict(
+            lambda: defaultdict(set)
+        )
+        self.tokens: dict[str, dict[str, set[str]]] = defaultdict(
+            lambda: defaultdict(set)
+        )
+        for document in documents:
+            for field in KEYWORD_FIELDS.get(name, ()):
+                for value in _values(document.get(field)):
+                    self.keywords[field][value].add(document["id"])
+            for field in TEXT_FIELDS.get(name, ()):
+                for value in _values(document.get(field)):
+                    for token in tokenize(value):
+                        self.tokens[field][token].add(document["id"])
+        # Отсортированные выборки для запросов без оценки релевантности:
+        # ключ - (запрос, сортировка), значение - (ключи сортировки, id)
+        self._sorted: dict[bytes, tuple[list, list[str]]] = {}
+
+    def match(self, field: str, text: str) -> set[str]:
+        postings = [self.tokens[field].get(token, set()) for token in tokenize(text)]
+        if not postings:
+            return set()
+        postings.sort(key=len)
+        return set.intersection(*postings)
+
+
+class FakeElasticsearch:
+    def __init__(
+        self,
+        indexes: dict[str, list[dict]],
+        latency_in_seconds: float = 0.0,
+        jitter_in_seconds: float = 0.0,
+        seed: int = 42,
+    ):
+        self.indexes = {
+            name: FakeIndex(name, documents) for name, documents in indexes.items()
+        }
+        self.latency_in_seconds = latency_in_seconds
+        self.jitter_in_seconds = jitter_in_seconds
+        self.calls: Counter[str] = Counter()
+        self._random = random.Random(seed)
+
+    async def _delay(self, operation: str) -> None:
+        self.calls[operation] += 1
+        delay = self.latency_in_seconds
+        if self.jitter_in_seconds:
+            delay = self._random.gauss(delay, self.jitter_in_seconds)
+        await asyncio.sleep(max(delay, 0.0))
+
+    async def get(
+        self,
+        index: str,
+        id: str,
+        source_includes: list[str] | None = None,
+        **kwargs,
+    ) -> dict:
+        await self._delay("get")
+        document = self.indexes[index].documents.get(id)
+        if document is None:
+            raise _not_found(f"Документ {id} не найден в индексе {index}")
+        return {
+            "_index": index,
+            "_id": id,
+            "found": True,
+            "_source": _project(document, source_includes),
+        }
+
+    async def mget(
+        self,
+        index: str,
+        ids: list[str] | None = None,
+        body: dict | None = None,
+        source_includes: list[str] | None = None,
+        **kwargs,
+    ) -> dict:
+        await self._delay("mget")
+        documents = self.indexes[index].documents
+        docs = []
+        for document_id in ids if ids is not None else body["ids"]:
+            document = documents.get(document_id)
+            if document is None:
+                docs.append({"_index": index, "_id": document_id, "found": False})
+            else:
+                docs.append(
+                    {
+                        "_index": index,
+                        "_id": document_id,
+                        "found": True,
+                        "_source": _project(document, source_includes),
+                    }
+                )
+        return {"docs": docs}
+
+    async def search(self, index: str, body: dict | None = None, **kwargs) -> dict:
+        await self._delay("search")
+        return self._search(self.indexes[index], body or {})
+
+    async def msearch(self, searches: list[dict], **kwargs) -> dict:
+        await self._delay("msearch")
+        responses = []
+        for header, body in zip(searches[::2], searches[1::2]):
+            responses.append(self._search(self.indexes[header["index"]], body))
+        return {"responses": responses}
+
+    async def close(self) -> None:
+        pass
+
+    def _search(self, index: FakeIndex, body: dict) -> dict:
+        query = body.get("query", {"match_all": {}})
+        sort = _sort_fields(body.get("sort"))
+
+        if _is_unscored(query):
+            keys, ids = self._sorted_ids(index, query, sort)
+            scores, named = {}, {}
+        else:
+            scores, named = self._evaluate(index, query)
+            keyed = sorted(
+                (_sort_key(index.documents[document_id], score, sort), document_id)
+                for document_id, score in scores.items()
+            )
+            keys = [key for key, _ in keyed]
+            ids = [document_id for _, document_id in keyed]
+
+        start = 0
+        if search_after := body.get("search_after"):
+            start = bisect.bisect_right(keys, _after_key(search_after, sort))
+        start += body.get("from", 0)
+        page = ids[start : start + body.get("size", 10)]
+
+        hits = []
+        for document_id in page:
+            document = index.documents[document_id]
+            score = scores.get(document_id, 1.0)
+            hit = {
+                "_index": index.name,
+                "_id": document_id,
+                "_score": score,
+                "_source": _project(document, body.get("_source")),
+            }
+            if sort:
+                hit["sort"] = [
+                    score if field == "_score" else document.get(field)
+                    for field, _ in sort
+                ]
+            if document_id in named:
+                hit["matched_queries"] = sorted(named[document_id])
+            hits.append(hit)
+
+        return {
+            "hits": {
+                "total": {"value": len(ids), "relation": "eq"},
+                "max_score": max(scores.values(), default=1.0),
+                "hits": hits,
+            }
+        }
+
+    def _sorted_ids(
+        self, index: FakeIndex, query: dict, sort: list[tuple[str, bool]]
+    ) -> tuple[list, list[str]]:
+        cache_key = orjson.dumps([query, sort], option=orjson.OPT_SORT_KEYS)
+        if (result := index._sorted.get(cache_key)) is not None:
+            return result
+
+        if "terms" in query:
+            ((field, values),) = query["terms"].items()
+            ids = set()
+            for value in values:
+                ids |= index.keywords[field].get(value, set())
+        elif "ids" in query:
+            ids = set(query["ids"]["values"]) & index.documents.keys()
+        else:
+            ids = index.documents.keys()
+
+        keyed = sorted(
+            (_sort_key(index.documents[document_id], 1.0, sort), document_id)
+            for document_id in ids
+        )
+        result = [key for key, _ in keyed], [document_id for _, document_id in keyed]
+        if "ids" not in query:
+            index._sorted[cache_key] = result
+        return result
+
+    def _evaluate(
+        self, index: FakeIndex, query: dict
+    ) -> tuple[dict[str, float], dict[str, set[str]]]:
+        """Документы, подходящие под запрос, их оценки и имена
+        сработавших именованных запросов"""
+
+        named: dict[str, set[str]] = defaultdict(set)
+
+        if "match_all" in query or "terms" in query or "ids" in query:
+            _, ids = self._sorted_ids(index, query, [])
+            return dict.fromkeys(ids, 1.0), named
+
+        if "match" in query:
+            ((field, condition),) = query["match"].items()
+            if isinstance(condition, dict):
+                text, name = condition["query"], condition.get("_name")
+            else:
+                text, name = condition, None
+            ids = index.match(field, text)
+            if name:
+                for document_id in ids:
+                    named[document_id].add(name)
+            return dict.fromkeys(ids, 1.0), named
+
+        if "multi_match" in query:
+            scores: dict[str, float] = defaultdict(float)
+            for field in query["multi_match"]["fields"]:
+                for document_id in index.match(
+                    field.split("^")[0], query["multi_match"]["query"]
+                ):
+                    scores[document_id] += 1.0
+            return scores, named
+
+        if "more_like_this" in query:
+            return self._more_like_this(index, query["more_like_this"]), named
+
+        if "bool" in query:
+            scores = defaultdict(float)
+            matched = Counter()
+            should = query["bool"].get("should", [])
+            for clause in should:
+                clause_scores, clause_named = self._evaluate(index, clause)
+                for document_id, score in clause_scores.items():
+                    scores[document_id] += score
+                    matched[document_id] += 1
+                for document_id, names in clause_named.items():
+                    named[document_id] |= names
+            minimum = query["bool"].get("minimum_should_match", 1 if should else 0)
+            return {
+                document_id: score
+                for document_id, score in scores.items()
+                if matched[document_id] >= minimum
+            }, named
+
+        if "function_score" in query:
+            function_score = query["function_score"]
+            scores, named = self._evaluate(index, function_score["query"])
+            for function in function_score.get("functions", []):
+                factor = function["field_value_factor"]
+                for document_id in scores:
+                    value = index.documents[document_id].get(factor["field"])
+                    value = factor.get("missing", 0) if value is None else value
+                    if factor.get("modifier") == "log1p":
+                        value = math.log10(1 + value)
+                    scores[document_id] *= value
+            return scores, named
+
+        raise ValueError(f"Запрос не поддерживается: {list(query)}")
+
+    @staticmethod
+    def _more_like_this(index: FakeIndex, query: dict) -> dict[str, float]:
+        scores: dict[str, float] = defaultdict(float)
+        boost = query.get("boost", 1.0)
+        for like in query["like"]:
+            source = index.documents.get(like["_id"])
+            if source is None:
+                continue
+            for field in query["fields"]:
+                for value in _values(source.get(field)):
+                    for document_id in index.keywords[field].get(value, ()):
+                        scores[document_id] += boost
+            scores.pop(like["_id"], None)
+        return scores
+
+
+def _is_unscored(query: dict) -> bool:
+    return "match_all" in query or "terms" in query or "ids" in query
+
+
+def _sort_fields(sort: list | None) -> list[tuple[str, bool]]:
+    """Сортировка запроса в виде [(поле, по убыванию)]"""
+
+    fields = []
+    for item in sort or []:
+        if isinstance(item, str):
+            fields.append((item, item == "_score"))
+            continue
+        ((field, order),) = item.items()
+        if isinstance(order, dict):
+            order = order.get("order", "desc" if field == "_score" else "asc")
+        fields.append((field, order == "desc"))
+    return fields
+
+
+def _sort_key(document: dict, score: float, sort: Iterable[tuple[str, bool]]):
+    key = []
+    for field, descending in sort or (("_score", True), ("id", False)):
+        value = score if field == "_score" else document.get(field)
+        # Документы без значения поля идут последними, как в Elasticsearch
+        if value is None:
+            key.append((1, None))
+        else:
+            key.append((0, _Descending(value) if descending else value))
+    return tuple(key)
+
+
+def _after_key(values: list, sort: list[tuple[str, bool]]) -> tuple:
+    return tuple(
+        (1, None) if value is None else (0, _Descending(value) if descending else value)
+        for value, (_, descending) in zip(values, sort)
+    )
+
+
+def _project(document: dict, source: Any) -> dict:
+    """Поля документа по параметру _source (source_includes)"""
+
+    if source is False:
+        return {}
+    if not source or source is True:
+        return dict(document)
+    return {field: document[field] for field in source if field in document}
@@ -0,0 +1,480 @@
+"""Нагрузочный тест API на локальных заменах Elasticsearch и Redis.
+
+Приложение запускается в процессе вместе с FakeElasticsearch на синтетическом
+каталоге и fakeredis. Для каждого сценария (маршрута api/v1) кеш очищается,
+выполняется прогрев, затем замеряются пропускная способность, перцентили
+задержки и число обращений к Elasticsearch и Redis на запрос.
+
+    python -m benchmarks.run --output benchmarks/baseline.json
+    python -m benchmarks.run --baseline benchmarks/baseline.json
+
+Нужны пакеты группы dev: poetry install --with dev.
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Callable
+
+import httpx
+import orjson
+from fakeredis.aioredis import FakeRedis
+from redis.asyncio.client import Pipeline
+
+os.environ.setdefault("REDIS_PASSWORD", "benchmark")
+
+from benchmarks.catalogue import (  # noqa: E402
+    LAST_NAMES,
+    WORDS,
+    Catalogue,
+    build_catalogue,
+    skewed_index,
+)
+from benchmarks.fake_elastic import FakeElasticsearch  # noqa: E402
+from src import main  # noqa: E402
+from src.core.config import config  # noqa: E402
+from src.core.logger import a_api_logger  # noqa: E402
+from src.db import cache, elastic, local_cache  # noqa: E402
+
+# Команды фоновых задач (чтение событий инвалидации), не связанные с запросами
+BACKGROUND_COMMANDS = {"XREADGROUP", "XGROUP CREATE", "XACK", "SUBSCRIBE"}
+
+
+class CountingRedis(FakeRedis):
+    """fakeredis, считающий обращения к серверу и выдерживающий задержку.
+    Конвейер считается одним обращением."""
+
+    def __init__(self, *args, latency_in_seconds: float = 0.0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.latency_in_seconds = latency_in_seconds
+        self.calls: Counter[str] = Counter()
+
+    async def round_trip(self, command: str) -> None:
+        if command in BACKGROUND_COMMANDS:
+            return
+        self.calls[command] += 1
+        if self.latency_in_seconds:
+            await asyncio.sleep(self.latency_in_seconds)
+
+    async def execute_command(self, *args, **options):
+        command = str(args[0]).upper()
+        if command == "XREADGROUP" and b"BLOCK" in args:
+            return await self._blocking_read(args, options)
+        await self.round_trip(command)
+        return await super().execute_command(*args, **options)
+
+    async def _blocking_read(self, args: tuple, options: dict):
+        """Блокирующее чтение потока через периодический опрос: fakeredis
+        ожидает новых сообщений, не отдавая управление циклу событий"""
+
+        position = args.index(b"BLOCK")
+        timeout = int(args[position + 1]) / 1000
+        args = args[:position] + args[position + 2 :]
+        deadline = time.monotonic() + timeout
+        while True:
+            response = await super().execute_command(*args, **options)
+            if response or time.monotonic() >= deadline:
+                return response
+            await asyncio.sleep(0.1)
+
+    def pipeline(self, transaction: bool = True, shard_hint=None) -> Pipeline:
+        return CountingPipeline(
+            self, self.connection_pool, self.response_callbacks, transaction, shard_hint
+        )
+
+
+class CountingPipeline(Pipeline):
+    def __init__(self, redis: CountingRedis, *args):
+        super().__init__(*args)
+        self.redis = redis
+
+    async def execute(self, raise_on_error: bool = True):
+        if self.command_stack:
+            await self.redis.round_trip("PIPELINE")
+        return await super().execute(raise_on_error)
+
+
+@dataclass
+class Scenario:
+    name: str
+    method: str
+    # Путь и тело запроса по генератору случайных чисел и каталогу
+    make_request: Callable[[random.Random, Catalogue], tuple[str, dict | None]]
+
+
+def _film(rng: random.Random, catalogue: Catalogue) -> dict:
+    return catalogue.films[skewed_index(rng, len(catalogue.films), 3.0)]
+
+
+def _genre(rng: random.Random, catalogue: Catalogue) -> dict:
+    return catalogue.genres[skewed_index(rng, len(catalogue.genres))]
+
+
+def _person(rng: random.Random, catalogue: Catalogue) -> dict:
+    return catalogue.persons[skewed_index(rng, len(catalogue.persons), 3.0)]
+
+
+def _page(rng: random.Random) -> int:
+    return skewed_index(rng, 20) + 1
+
+
+def _batch(rng: random.Random, items: list[dict], size: int = 20) -> dict:
+    return {
+        "ids": [items[skewed_index(rng, len(items), 3.0)]["id"] for _ in range(size)]
+    }
+
+
+SCENARIOS = [
+    Scenario(
+        "films.details",
+        "GET",
+        lambda rng, c: (f"/api/v1/films/{_film(rng, c)['id']}", None),
+    ),
+    Scenario(
+        "films.list",
+        "GET",
+        lambda rng, c: (
+            f"/api/v1/films/?sort=-imdb_rating&page_number={_page(rng)}",
+            None,
+        ),
+    ),
+    Scenario(
+        "films.list_by_genre",
+        "GET",
+        lambda rng, c: (
+            f"/api/v1/films/?genre={_genre(rng, c)['id']}&page_number={_page(rng)}",
+            None,
+        ),
+    ),
+    Scenario(
+        "films.cursor",
+        "GET",
+        lambda rng, c: (f"/api/v1/films/?genre={_genre(rng, c)['id']}&cursor=", None),
+    ),
+    Scenario(
+        "films.similar",
+        "GET",
+        lambda rng, c: (f"/api/v1/films/{_film(rng, c)['id']}/similar", None),
+    ),
+    Scenario(
+        "films.search",
+        "GET",
+        lambda rng, c: (
+            f"/api/v1/films/search/?search={rng.choice(WORDS)}"
+            f"&page_number={_page(rng)}",
+            None,
+        ),
+    ),
+    Scenario(
+        "films.batch",
+        "POST",
+        lambda rng, c: ("/api/v1/films/batch", _batch(rng, c.films)),
+    ),
+    Scenario(
+        "genres.list",
+        "GET",
+        lambda rng, c: (f"/api/v1/genres/?page_number={rng.randint(1, 3)}", None),
+    ),
+    Scenario(
+        "genres.details",
+        "GET",
+        lambda rng, c: (
+            "/api/v1/genres/{0}?genre_uuid={0}".format(_genre(rng, c)["id"]),
+            None,
+        ),
+    ),
+    Scenario(
+        "genres.batch",
+        "POST",
+        lambda rng, c: ("/api/v1/genres/batch", _batch(rng, c.genres, 5)),
+    ),
+    Scenario(
+        "persons.details",
+        "GET",
+        lambda rng, c: (f"/api/v1/persons/{_person(rng, c)['id']}", None),
+    ),
+    Scenario(
+        "persons.films",
+        "GET",
+        lambda rng, c: (f"/api/v1/persons/{_person(rng, c)['id']}/film/", None),
+    ),
+    Scenario(
+        "persons.search",
+        "GET",
+        lambda rng, c: (
+            f"/api/v1/persons/search?query={rng.choice(LAST_NAMES)}"
+            f"&page_number={_page(rng)}",
+            None,
+        ),
+    ),
+    Scenario(
+        "persons.batch",
+        "POST",
+        lambda rng, c: ("/api/v1/persons/batch", _batch(rng, c.persons)),
+    ),
+]
+
+
+def percentile(latencies: list[float], percent: int) -> float:
+    if len(latencies) == 1:
+        return latencies[0]
+    return statistics.quantiles(latencies, n=100, method="inclusive")[percent - 1]
+
+
+async def reset_caches(redis: CountingRedis) -> None:
+    """Очистка кеша перед сценарием; поток событий инвалидации сохраняется"""
+
+    keys = [
+        key
+        async for key in redis.scan_iter(count=1000)
+        if key.decode() != config.cache_invalidation_stream
+    ]
+    for start in range(0, len(keys), 1000):
+        await redis.unlink(*keys[start : start + 1000])
+    if local_cache.local_cache:
+        local_cache.local_cache.clear()
+
+
+async def drive(
+    client: httpx.AsyncClient,
+    requests: list[tuple[str, str, dict | None]],
+    concurrency: int,
+) -> tuple[list[float], Counter, float]:
+    """Выполнение запросов в concurrency параллельных потоках"""
+
+    latencies = []
+    statuses: Counter[str] = Counter()
+    pending = iter(requests)
+
+    async def worker() -> None:
+        for method, path, body in pending:
+            started_at = time.perf_counter()
+            try:
+                response = await client.request(method, path, json=body)
+                statuses[str(response.status_code)] += 1
+            except Exception as exc:
+                statuses[type(exc).__name__] += 1
+            latencies.append(time.perf_counter() - started_at)
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, statuses, time.perf_counter() - started_at
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    scenario: Scenario,
+    catalogue: Catalogue,
+    es: FakeElasticsearch,
+    redis: CountingRedis,
+    args: argparse.Namespace,
+) -> dict:
+    rng = random.Random(f"{args.seed}:{scenario.name}")
+    requests = [
+        (scenario.method, *scenario.make_request(rng, catalogue))
+        for _ in range(args.warmup + args.requests)
+    ]
+
+    await reset_caches(redis)
+    await drive(client, requests[: args.warmup], args.concurrency)
+
+    es_calls = sum(es.calls.values())
+    redis_calls = sum(redis.calls.values())
+    latencies, statuses, elapsed = await drive(
+        client, requests[args.warmup :], args.concurrency
+    )
+    es_calls = sum(es.calls.values()) - es_calls
+    redis_calls = sum(redis.calls.values()) - redis_calls
+
+    return {
+        "requests": len(latencies),
+        "errors": sum(
+            count
+            for status, count in statuses.items()
+            if not status.isdigit() or int(status) >= 500
+        ),
+        "statuses": dict(sorted(statuses.items())),
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50) * 1000, 3),
+            "p95": round(percentile(latencies, 95) * 1000, 3),
+            "p99": round(percentile(latencies, 99) * 1000, 3),
+            "mean": round(statistics.fmean(latencies) * 1000, 3),
+            "max": round(max(latencies) * 1000, 3),
+        },
+        "es_calls_per_request": round(es_calls / len(latencies), 3),
+        "redis_calls_per_request": round(redis_calls / len(latencies), 3),
+    }
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args: argparse.Namespace) -> dict:
+    started_at = time.perf_counter()
+    catalogue = build_catalogue(args.films, args.persons, args.seed)
+    es = FakeElasticsearch(
+        catalogue.indexes(),
+        latency_in_seconds=args.es_latency_ms / 1000,
+        jitter_in_seconds=args.es_jitter_ms / 1000,
+        seed=args.seed,
+    )
+    redis = CountingRedis(latency_in_seconds=args.redis_latency_ms / 1000)
+    print(
+        f"Каталог построен за {time.perf_counter() - started_at:.1f} с",
+        file=sys.stderr,
+    )
+
+    cache.create_redis = lambda listener=False: redis
+    elastic.create_elastic = lambda: es
+
+    scenarios = [
+        scenario
+        for scenario in SCENARIOS
+        if not args.scenarios
+        or any(scenario.name.startswith(prefix) for prefix in args.scenarios)
+    ]
+
+    results = {}
+    async with main.app.router.lifespan_context(main.app):
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=main.app),
+            base_url="http://benchmark",
+            timeout=None,
+        ) as client:
+            for scenario in scenarios:
+                results[scenario.name] = await run_scenario(
+                    client, scenario, catalogue, es, redis, args
+                )
+                print(
+                    format_row(scenario.name, results[scenario.name]), file=sys.stderr
+                )
+
+    return {
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "parameters": {
+            "films": args.films,
+            "persons": args.persons,
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "concurrency": args.concurrency,
+            "es_latency_ms": args.es_latency_ms,
+            "es_jitter_ms": args.es_jitter_ms,
+            "redis_latency_ms": args.redis_latency_ms,
+            "seed": args.seed,
+        },
+        "scenarios": results,
+    }
+
+
+def format_row(name: str, result: dict) -> str:
+    latency = result["latency_ms"]
+    return (
+        f"{name:<22} {result['throughput_rps']:>9.1f} rps  "
+        f"p50 {latency['p50']:>8.2f}  p95 {latency['p95']:>8.2f}  "
+        f"p99 {latency['p99']:>8.2f} ms  "
+        f"es {result['es_calls_per_request']:>6.3f}  "
+        f"redis {result['redis_calls_per_request']:>6.3f}  "
+        f"errors {result['errors']}"
+    )
+
+
+def compare(report: dict, baseline: dict, max_regression: float | None) -> bool:
+    """Сравнение с базовым прогоном. Возвращает False, если пропускная
+    способность или p95 ухудшились больше чем на max_regression"""
+
+    if report["parameters"] != baseline["parameters"]:
+        print("Параметры прогонов отличаются, сравнение приблизительное")
+
+    passed = True
+    print(f"Сравнение с {baseline.get('revision') or 'базовым прогоном'}:")
+    for name, result in report["scenarios"].items():
+        base = baseline["scenarios"].get(name)
+        if not base:
+            continue
+
+        changes = {
+            "rps": _change(result["throughput_rps"], base["throughput_rps"]),
+            **{
+                key: _change(result["latency_ms"][key], base["latency_ms"][key])
+                for key in ("p50", "p95", "p99")
+            },
+        }
+        print(
+            f"{name:<22} "
+            + "  ".join(f"{key} {change:+7.1%}" for key, change in changes.items())
+        )
+
+        if max_regression is not None and (
+            changes["rps"] < -max_regression or changes["p95"] > max_regression
+        ):
+            print(f"  регрессия больше {max_regression:.0%}")
+            passed = False
+    return passed
+
+
+def _change(value: float, base: float) -> float:
+    return (value - base) / base if base else 0.0
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--films", type=int, default=100_000)
+    parser.add_argument("--persons", type=int, default=300_000)
+    parser.add_argument("--requests", type=int, default=2000, help="на сценарий")
+    parser.add_argument("--warmup", type=int, default=200, help="на сценарий")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--es-latency-ms", type=float, default=2.0)
+    parser.add_argument("--es-jitter-ms", type=float, default=0.5)
+    parser.add_argument("--redis-latency-ms", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--scenarios", nargs="*", help="префиксы имен сценариев, например films"
+    )
+    parser.add_argument("--output", help="файл для сохранения результатов в JSON")
+    parser.add_argument("--baseline", help="результаты прогона для сравнения")
+    parser.add_argument(
+        "--max-regression",
+        type=float,
+        help="допустимое ухудшение rps и p95 (0.1 = 10%%), иначе код выхода 1",
+    )
+    return parser.parse_args()
+
+
+def main_cli() -> None:
+    args = parse_args()
+    a_api_logger.setLevel(logging.CRITICAL)
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    report = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, "wb") as output:
+            output.write(orjson.dumps(report, option=orjson.OPT_INDENT_2))
+
+    if args.baseline:
+        with open(args.baseline, "rb") as baseline:
+            if not compare(report, orjson.loads(baseline.read()), args.max_regression):
+                sys.exit(1)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,19 @@
+"""Настройки gunicorn: сбор метрик prometheus_client со всех воркеров"""
+
+import os
+import shutil
+
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/prometheus_multiproc")
+
+
+def on_starting(server):
+    # Файлы метрик прошлого запуска не должны попасть в новые значения
+    directory = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(directory)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,11 @@
+from fastapi import APIRouter
+from fastapi.responses import Response
+
+from src.utils import metrics
+
+router = APIRouter()
+
+
+@router.get("/metrics", include_in_schema=False)
+async def prometheus_metrics() -> Response:
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE_LATEST)
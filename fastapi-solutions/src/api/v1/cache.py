@@ -0,0 +1,89 @@
+import hmac
+from http import HTTPStatus
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from pydantic import BaseModel
+
+from src.core.config import config
+from src.db import cache, elastic
+from src.db.invalidation import CacheInvalidator, get_cache_invalidator
+from src.db.popularity import popularity_tracker
+
+router = APIRouter()
+
+
+async def verify_admin_token(x_admin_token: str = Header(default="")) -> None:
+    if not config.admin_token or not hmac.compare_digest(
+        x_admin_token.encode(), config.admin_token.encode()
+    ):
+        raise HTTPException(status_code=HTTPStatus.FORBIDDEN, detail="Доступ запрещен")
+
+
+class Invalidation(BaseModel):
+    index: str
+    ids: list[str]
+    lists: bool = True
+
+
+class InvalidationResult(BaseModel):
+    invalidated: int
+
+
+class PoolStats(BaseModel):
+    redis: dict[str, int]
+    elastic: dict[str, int]
+
+
+class HotKey(BaseModel):
+    key: str
+    frequency: int
+
+
+@router.post(
+    "/invalidate",
+    response_model=InvalidationResult,
+    summary="Инвалидация кеша",
+    description="Удаляет из кеша все ключи, зависящие от переданных сущностей",
+    dependencies=[Depends(verify_admin_token)],
+)
+async def invalidate(
+    invalidation: Invalidation,
+    cache_invalidator: CacheInvalidator = Depends(get_cache_invalidator),
+) -> InvalidationResult:
+    invalidated = await cache_invalidator.invalidate(
+        invalidation.index, invalidation.ids, invalidation.lists
+    )
+    return InvalidationResult(invalidated=invalidated)
+
+
+@router.get(
+    "/pools",
+    response_model=PoolStats,
+    summary="Загрузка пулов соединений",
+    description="Возвращает число занятых и доступных соединений с Redis и Elasticsearch",
+    dependencies=[Depends(verify_admin_token)],
+)
+async def pools() -> PoolStats:
+    return PoolStats(redis=cache.pool_stats(), elastic=elastic.pool_stats())
+
+
+@router.get(
+    "/hot-keys",
+    response_model=list[HotKey],
+    summary="Популярные ключи кеша",
+    description="Возвращает самые запрашиваемые в этом процессе ключи кеша "
+    "с оценкой числа обращений к ним за последнее время",
+    dependencies=[Depends(verify_admin_token)],
+)
+async def hot_keys(
+    limit: int = Query(default=20, ge=1, le=config.cache_popularity_hot_keys_size),
+) -> list[HotKey]:
+    if not popularity_tracker:
+        raise HTTPException(
+            status_code=HTTPStatus.NOT_FOUND,
+            detail="Учет популярности ключей отключен",
+        )
+    return [
+        HotKey(key=key, frequency=frequency)
+        for key, frequency in popularity_tracker.hot_keys(limit)
+    ]
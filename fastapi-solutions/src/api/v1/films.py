@@ -1,14 +1,21 @@
 from http import HTTPStatus
 import uuid
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from pydantic import BaseModel
 
 from src.core.logger import a_api_logger
+from src.models.batch import BatchRequest, BatchResponse
 from src.models.film import FilmBase
 from src.models.genre import Genre
 from src.models.person import Person
 from src.services.film import FilmService, get_film_service
-from src.utils.pagination import Paginator
+from src.utils.ids import is_uuid
+from src.utils.pagination import CursorPaginator, Paginator
+from src.utils.responses import (
+    batch_json_response,
+    cached_json_response,
+    cursor_json_response,
+)
 
 router = APIRouter()
 
@@ -24,24 +31,40 @@ class Film(BaseModel):
     directors: list[Person]
 
 
+@router.post(
+    "/batch",
+    response_model=BatchResponse[Film],
+    summary="Полная информация по нескольким фильмам",
+)
+async def films_batch(
+    batch: BatchRequest,
+    film_service: FilmService = Depends(get_film_service),
+) -> Response:
+    ids = list(dict.fromkeys(batch.ids))
+    films = await film_service.get_films_details(ids)
+    return batch_json_response(Film, ids, films)
+
+
 @router.get("/{film_id}", response_model=Film, summary="Полная информация по фильму")
 async def film_details(
-    film_id: str, film_service: FilmService = Depends(get_film_service)
-) -> Film:
-    film = await film_service.get_film_details(film_id)
-    if not film:
-        a_api_logger.error("Фильм не найден")
+    request: Request,
+    film_id: str,
+    film_service: FilmService = Depends(get_film_service),
+) -> Response:
+    if not is_uuid(film_id):
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Фильм не найден")
 
-    return Film(
-        uuid=film.uuid,
-        title=film.title,
-        imdb_rating=film.imdb_rating,
-        description=film.description,
-        genres=film.genres,
-        actors=film.actors,
-        writers=film.writers,
-        directors=film.directors,
+    async def build():
+        film = await film_service.get_film_details(film_id)
+        if not film:
+            a_api_logger.error("Фильм не найден")
+            raise HTTPException(
+                status_code=HTTPStatus.NOT_FOUND, detail="Фильм не найден"
+            )
+        return film
+
+    return await cached_json_response(
+        request, film_service.cache, Film, build, {"film_id": film_id}
     )
 
 
@@ -53,29 +76,60 @@ class Films(BaseModel):
 
 @router.get("/", response_model=list[Films], summary="Получение всех фильмов")
 async def films(
+    request: Request,
     genre: uuid.UUID = None,
     sort: str = "-imdb_rating",
     paginated_params: Paginator = Depends(),
+    cursor_params: CursorPaginator = Depends(),
     film_service: FilmService = Depends(get_film_service),
-) -> list[FilmBase]:
-    return await film_service.get_all_films_from_elastic(
-        genre, sort, paginated_params.page_number, paginated_params.page_size
+) -> Response:
+    if cursor_params.enabled:
+        films_list, next_cursor = await film_service.get_films_by_cursor(
+            genre, sort, cursor_params.search_after, paginated_params.page_size
+        )
+        return cursor_json_response(list[Films], films_list, next_cursor)
+
+    return await cached_json_response(
+        request,
+        film_service.cache,
+        list[Films],
+        lambda: film_service.get_all_films_from_elastic(
+            genre, sort, paginated_params.page_number, paginated_params.page_size
+        ),
+        {
+            "genre": genre,
+            "sort": sort,
+            "page_number": paginated_params.page_number,
+            "page_size": paginated_params.page_size,
+        },
     )
 
 
 @router.get(
     "/{film_id}/similar",
     response_model=list[FilmBase],
-    summary="Похожие фильмы (с такими же жанрами)",
+    summary="Похожие фильмы (общие жанры и персоны, рейтинг)",
 )
 async def similar_films(
-    film_id: str, film_service: FilmService = Depends(get_film_service)
-) -> list[FilmBase]:
-    films = await film_service.get_similar_films(film_id)
-    if not films:
-        a_api_logger.error("Фильм не найден")
+    request: Request,
+    film_id: str,
+    film_service: FilmService = Depends(get_film_service),
+) -> Response:
+    if not is_uuid(film_id):
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Фильм не найден")
-    return films
+
+    async def build():
+        films = await film_service.get_similar_films(film_id)
+        if not films:
+            a_api_logger.error("Фильм не найден")
+            raise HTTPException(
+                status_code=HTTPStatus.NOT_FOUND, detail="Фильм не найден"
+            )
+        return films
+
+    return await cached_json_response(
+        request, film_service.cache, list[FilmBase], build, {"film_id": film_id}
+    )
 
 
 @router.get(
@@ -84,8 +138,15 @@ async def similar_films(
 async def search_film(
     search: str,
     paginated_params: Paginator = Depends(),
+    cursor_params: CursorPaginator = Depends(),
     film_service: FilmService = Depends(get_film_service),
-) -> list[Films] | None:
+) -> list[Films] | Response | None:
+    if cursor_params.enabled:
+        films_list, next_cursor = await film_service.search_film_by_cursor(
+            search, cursor_params.search_after, paginated_params.page_size
+        )
+        return cursor_json_response(list[Films], films_list, next_cursor)
+
     films = await film_service.search_film(
         search, paginated_params.page_number, paginated_params.page_size
     )
@@ -1,11 +1,18 @@
 import uuid
 from http import HTTPStatus
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from pydantic import BaseModel
 
+from src.models.batch import BatchRequest, BatchResponse
 from src.services.genre import GenreService, get_genre_service
-from src.utils.pagination import Paginator
+from src.utils.ids import is_uuid
+from src.utils.pagination import CursorPaginator, Paginator
+from src.utils.responses import (
+    batch_json_response,
+    cached_json_response,
+    cursor_json_response,
+)
 
 router = APIRouter()
 
@@ -22,18 +29,52 @@ class Genre(BaseModel):
     description="Возвращает список всех жанров",
 )
 async def genres(
+    request: Request,
     paginated_params: Paginator = Depends(),
+    cursor_params: CursorPaginator = Depends(),
     genre_service: GenreService = Depends(get_genre_service),
-) -> list[Genre]:
-    genres_list = await genre_service.get_genres(
-        paginated_params.page_number, paginated_params.page_size
-    )
-    if not genres_list:
-        raise HTTPException(
-            status_code=HTTPStatus.NOT_FOUND, detail="Не найдено ни одного жанра"
+) -> Response:
+    if cursor_params.enabled:
+        genres_list, next_cursor = await genre_service.get_genres_by_cursor(
+            cursor_params.search_after, paginated_params.page_size
         )
+        return cursor_json_response(list[Genre], genres_list, next_cursor)
 
-    return genres_list
+    async def build():
+        genres_list = await genre_service.get_genres(
+            paginated_params.page_number, paginated_params.page_size
+        )
+        if not genres_list:
+            raise HTTPException(
+                status_code=HTTPStatus.NOT_FOUND, detail="Не найдено ни одного жанра"
+            )
+        return genres_list
+
+    return await cached_json_response(
+        request,
+        genre_service.cache,
+        list[Genre],
+        build,
+        {
+            "page_number": paginated_params.page_number,
+            "page_size": paginated_params.page_size,
+        },
+    )
+
+
+@router.post(
+    "/batch",
+    response_model=BatchResponse[Genre],
+    summary="Получение нескольких жанров по их uuid",
+    description="Возвращает найденные жанры и список uuid, которые не найдены",
+)
+async def genres_batch(
+    batch: BatchRequest,
+    genre_service: GenreService = Depends(get_genre_service),
+) -> Response:
+    ids = list(dict.fromkeys(batch.ids))
+    genres_by_uuid = await genre_service.get_genres_by_ids(ids)
+    return batch_json_response(Genre, ids, genres_by_uuid)
 
 
 @router.get(
@@ -43,9 +84,21 @@ async def genres(
     description="Возвращает информацию по заданному жанру",
 )
 async def genre(
-    genre_uuid: str, genre_service: GenreService = Depends(get_genre_service)
-) -> Genre:
-    genre = await genre_service.get_genre(genre_uuid)
-    if not genre:
+    request: Request,
+    genre_uuid: str,
+    genre_service: GenreService = Depends(get_genre_service),
+) -> Response:
+    if not is_uuid(genre_uuid):
         raise HTTPException(status_code=HTTPStatus.NOT_FOUND, detail="Жанр не найден")
-    return genre
+
+    async def build():
+        genre = await genre_service.get_genre(genre_uuid)
+        if not genre:
+            raise HTTPException(
+                status_code=HTTPStatus.NOT_FOUND, detail="Жанр не найден"
+            )
+        return genre
+
+    return await cached_json_response(
+        request, genre_service.cache, Genre, build, {"genre_uuid": genre_uuid}
+    )
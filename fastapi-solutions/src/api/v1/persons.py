@@ -1,10 +1,17 @@
 import uuid as uuid
 from http import HTTPStatus
 from pydantic import BaseModel
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 
+from src.models.batch import BatchRequest, BatchResponse
 from src.services.person import PersonService, get_person_service
-from src.utils.pagination import Paginator
+from src.utils.ids import is_uuid
+from src.utils.pagination import CursorPaginator, Paginator
+from src.utils.responses import (
+    batch_json_response,
+    cached_json_response,
+    cursor_json_response,
+)
 
 router = APIRouter()
 
@@ -30,17 +37,34 @@ class Person(BaseModel):
 async def person_search(
     query: str,
     paginated_params: Paginator = Depends(),
+    cursor_params: CursorPaginator = Depends(),
     person_service: PersonService = Depends(get_person_service),
-) -> list[Person]:
+) -> list[Person] | Response:
+    if cursor_params.enabled:
+        persons_list, next_cursor = await person_service.search_persons_by_cursor(
+            query, cursor_params.search_after, paginated_params.page_size
+        )
+        return cursor_json_response(list[Person], persons_list, next_cursor)
+
     persons_list = await person_service.search_for_a_person(
         query, paginated_params.page_number, paginated_params.page_size
     )
-    return [
-        Person(
-            uuid=person["uuid"], full_name=person["full_name"], films=person["films"]
-        )
-        for person in persons_list
-    ]
+    return [Person(**person.model_dump()) for person in persons_list]
+
+
+@router.post(
+    "/batch",
+    response_model=BatchResponse[Person],
+    summary="Получение нескольких персон по их uuid",
+    description="Возвращает найденные персоны и список id, которые не найдены",
+)
+async def persons_batch(
+    batch: BatchRequest,
+    person_service: PersonService = Depends(get_person_service),
+) -> Response:
+    ids = list(dict.fromkeys(batch.ids))
+    persons = await person_service.get_by_ids(ids)
+    return batch_json_response(Person, ids, persons)
 
 
 @router.get(
@@ -50,15 +74,26 @@ async def person_search(
     description="Возвращает персону по id",
 )
 async def person(
-    person_id: str, person_service: PersonService = Depends(get_person_service)
-) -> Person:
-    person = await person_service.get_by_id(person_id)
-    if not person:
+    request: Request,
+    person_id: str,
+    person_service: PersonService = Depends(get_person_service),
+) -> Response:
+    if not is_uuid(person_id):
         raise HTTPException(
             status_code=HTTPStatus.NOT_FOUND, detail="Персона не найдена"
         )
 
-    return person
+    async def build():
+        person = await person_service.get_by_id(person_id)
+        if not person:
+            raise HTTPException(
+                status_code=HTTPStatus.NOT_FOUND, detail="Персона не найдена"
+            )
+        return person
+
+    return await cached_json_response(
+        request, person_service.cache, Person, build, {"person_id": person_id}
+    )
 
 
 @router.get(
@@ -68,12 +103,34 @@ async def person(
     description="Возвращает фильмы по id персоны",
 )
 async def person_films(
-    person_id: str, person_service: PersonService = Depends(get_person_service)
-) -> list[PersonFilmWithRating]:
-    films = await person_service.get_only_person_films(person_id)
-    if not films:
+    request: Request,
+    person_id: str,
+    paginated_params: Paginator = Depends(),
+    person_service: PersonService = Depends(get_person_service),
+) -> Response:
+    if not is_uuid(person_id):
         raise HTTPException(
             status_code=HTTPStatus.NOT_FOUND, detail="Фильмы персоны не найдены"
         )
 
-    return films
+    async def build():
+        films = await person_service.get_only_person_films(
+            person_id, paginated_params.page_number, paginated_params.page_size
+        )
+        if not films:
+            raise HTTPException(
+                status_code=HTTPStatus.NOT_FOUND, detail="Фильмы персоны не найдены"
+            )
+        return films
+
+    return await cached_json_response(
+        request,
+        person_service.cache,
+        list[PersonFilmWithRating],
+        build,
+        {
+            "person_id": person_id,
+            "page_number": paginated_params.page_number,
+            "page_size": paginated_params.page_size,
+        },
+    )
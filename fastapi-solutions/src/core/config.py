@@ -18,10 +18,122 @@ class Settings(BaseSettings):
     redis_port: int = 6379
     redis_user: str = "app"
     redis_password: str
+    redis_auth_enabled: bool = False
+    redis_max_connections: int = 50
+    redis_listener_max_connections: int = 5
+    redis_pool_timeout_in_seconds: float = 1.0
+    redis_socket_timeout_in_seconds: float = 0.5
+    redis_connect_timeout_in_seconds: float = 1.0
+    redis_health_check_interval_in_seconds: int = 30
+    redis_retries: int = 2
+    redis_retry_backoff_base_in_seconds: float = 0.01
+    redis_retry_backoff_cap_in_seconds: float = 0.1
     cache_expire_in_seconds: int = 300
+    cache_stale_retention_in_seconds: int = 0
+
+    cache_stale_while_revalidate: bool = False
+    cache_soft_expire_in_seconds: dict[str, int] = {
+        "movies": 240,
+        "genres": 240,
+        "persons": 240,
+    }
+    cache_hard_expire_in_seconds: dict[str, int] = {}
+    cache_search_expire_in_seconds: int = 60
+    cache_search_empty_expire_in_seconds: int = 15
+    cache_negative_expire_in_seconds: int = 30
+    cache_early_refresh_beta: float = 1.0
+    cache_raw_responses: bool = True
+    cache_codec: str = "orjson"
+    cache_compression: str = ""
+    cache_compression_min_bytes: int = 1024
+
+    cache_tags_enabled: bool = True
+    cache_invalidation_stream: str = "cache_invalidation_events"
+    cache_invalidation_group: str = "async_api"
+    cache_invalidation_channel: str = "cache_invalidation"
+    cache_invalidation_batch_size: int = 500
+    cache_invalidation_claim_idle_in_seconds: int = 60
+
+    admin_token: str = ""
+
+    local_cache_enabled: bool = False
+    local_cache_max_bytes: int = 32 * 1024 * 1024
+    local_cache_expire_in_seconds: int = 30
+
+    cache_popularity_enabled: bool = True
+    cache_popularity_sketch_width: int = 16384
+    cache_popularity_sketch_depth: int = 4
+    cache_popularity_sample_size: int = 100_000
+    cache_popularity_hot_keys_size: int = 100
+    cache_popularity_hot_frequency: int = 32
+    cache_popularity_min_ttl_factor: float = 0.5
+    cache_popularity_max_ttl_factor: float = 4.0
+
+    cache_warming_enabled: bool = True
+    cache_warming_wait_on_startup: bool = False
+    cache_warming_interval_in_seconds: int = 240
+    cache_warming_pages: int = 5
+    cache_warming_sorts: list[str] = ["-imdb_rating"]
+    cache_warming_top_films: int = 100
+    cache_warming_concurrency: int = 5
+    cache_warming_timeout_in_seconds: float = 10.0
+
+    cache_lock_enabled: bool = False
+    cache_lock_timeout_in_seconds: float = 5
+    cache_lock_poll_interval_in_seconds: float = 0.05
 
     elastic_host: str = "127.0.0.1"
     elastic_port: int = 9200
+    elastic_connections_per_node: int = 25
+    elastic_request_timeout_in_seconds: float = 5.0
+    elastic_max_retries: int = 2
+    elastic_retry_on_timeout: bool = True
+    elastic_dead_node_backoff_in_seconds: float = 1.0
+    elastic_max_dead_node_backoff_in_seconds: float = 30.0
+    elastic_http_compress: bool = False
+    elastic_sniff_on_start: bool = False
+    elastic_sniff_on_node_failure: bool = False
+    elastic_min_delay_between_sniffing_in_seconds: float = 60.0
+    elastic_breaker_enabled: bool = True
+    elastic_breaker_window_size: int = 20
+    elastic_breaker_min_calls: int = 10
+    elastic_breaker_failure_rate: float = 0.5
+    elastic_breaker_slow_call_in_seconds: float = 2.0
+    elastic_breaker_open_in_seconds: float = 10.0
+
+    genres_dictionary_refresh_in_seconds: int = 600
+    genres_dictionary_max_size: int = 1000
+
+    id_filter_enabled: bool = False
+    id_filter_capacity: dict[str, int] = {
+        "movies": 1_000_000,
+        "genres": 10_000,
+        "persons": 1_000_000,
+    }
+    id_filter_error_rate: float = 0.01
+    id_filter_rebuild_interval_in_seconds: int = 3600
+    id_filter_batch_size: int = 5000
+    id_filter_channel: str = "id_filter"
+
+    person_films_size: int = 50
+
+    similar_films_size: int = 10
+    similar_films_genres_boost: float = 2.0
+    similar_films_people_boost: float = 1.0
+    similar_films_precomputed: bool = False
+    similar_films_expire_in_seconds: int = 86400
+    similar_films_batch_size: int = 100
+
+    batch_max_size: int = 100
+
+    fan_out_concurrency: int = 10
+    fan_out_timeout_in_seconds: float = 5.0
+
+    profiling_enabled: bool = False
+    profiling_sample_rate: float = 0.01
+    profiling_secret: str = ""
+    profiling_trace_file: str = ""
+    profiling_server_timing_max_entries: int = 50
 
     page_size: int = 10
     page_number: int = 1
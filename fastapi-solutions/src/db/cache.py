@@ -1,25 +1,185 @@
-from typing import Any
+import asyncio
+import math
+import random
+import secrets
+import time
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Iterable
 
-from orjson import orjson
-from redis.asyncio import Redis
+from pydantic import BaseModel
+from redis.asyncio import BlockingConnectionPool, Redis
+from redis.asyncio.client import Pipeline
+from redis.asyncio.retry import Retry
+from redis.backoff import EqualJitterBackoff
+from redis.exceptions import ConnectionError, TimeoutError
 
 from src.core.config import config
 from src.core.logger import a_api_logger
-from src.utils.orjson_dumps import orjson_dumps
+from src.db import codecs
+from src.db.invalidation import collect_tags, list_tag
+from src.db.local_cache import local_cache
+from src.db.popularity import popularity_tracker, track_lookups
+from src.utils.circuit_breaker import CircuitOpenError
+from src.utils.metrics import (
+    CallbackGauge,
+    cache_requests,
+    cache_serialization_duration,
+)
+from src.utils.profiling import span
+from src.utils.single_flight import SingleFlight
+from src.utils.staleness import is_stale, mark_stale
 
 redis: Redis | None = None
+# Клиент для блокирующего чтения Redis Stream и подписок pub/sub
+listener_redis: Redis | None = None
+
+single_flight = SingleFlight()
+
+background_tasks: set[asyncio.Task] = set()
+
+# Снятие блокировки, только если она все еще принадлежит этому построению
+RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+def create_redis(listener: bool = False) -> Redis:
+    """Создание клиента Redis с ограниченным пулом соединений, таймаутами
+    и повторными попытками с экспоненциальной задержкой из конфигурации.
+
+    При исчерпании пула запрос ждет освободившееся соединение не дольше
+    redis_pool_timeout_in_seconds, а не открывает новые без ограничений.
+
+    Клиент listener предназначен для XREADGROUP с BLOCK и pub/sub: ответа на
+    них можно ждать сколько угодно, поэтому таймаута чтения сокета у него
+    нет, а небольшой пул отделен от пула обычных запросов.
+    """
+
+    credentials = {}
+    if config.redis_auth_enabled:
+        credentials = {
+            "username": config.redis_user,
+            "password": config.redis_password,
+        }
+
+    pool = BlockingConnectionPool(
+        host=config.redis_host,
+        port=config.redis_port,
+        max_connections=(
+            config.redis_listener_max_connections
+            if listener
+            else config.redis_max_connections
+        ),
+        timeout=config.redis_pool_timeout_in_seconds,
+        socket_timeout=None if listener else config.redis_socket_timeout_in_seconds,
+        socket_connect_timeout=config.redis_connect_timeout_in_seconds,
+        socket_keepalive=True,
+        health_check_interval=config.redis_health_check_interval_in_seconds,
+        retry=Retry(
+            EqualJitterBackoff(
+                cap=config.redis_retry_backoff_cap_in_seconds,
+                base=config.redis_retry_backoff_base_in_seconds,
+            ),
+            config.redis_retries,
+            supported_errors=(ConnectionError, TimeoutError),
+        ),
+        retry_on_error=[ConnectionError, TimeoutError],
+        **credentials,
+    )
+    return Redis.from_pool(pool)
+
+
+def pool_stats() -> dict[str, int]:
+    """Загрузка пула соединений Redis"""
+
+    pool = redis.connection_pool if redis is not None else None
+    if pool is None:
+        return {"max_connections": 0, "in_use": 0, "idle": 0}
+    return {
+        "max_connections": pool.max_connections,
+        "in_use": len(pool._in_use_connections),
+        "idle": len(pool._available_connections),
+    }
+
+
+CallbackGauge(
+    "redis_pool_connections",
+    "Соединения пула Redis",
+    ("state",),
+    lambda: {(state,): value for state, value in pool_stats().items()},
+)
 
 
 async def get_redis() -> Redis:
     return redis
 
 
+# Запас времени до истечения TTL, в течение которого значение уже считается
+# истекшим. Прогрев кеша выставляет его, чтобы заранее перестроить значения,
+# которые истекут до следующего прогрева.
+refresh_horizon: ContextVar[float] = ContextVar("refresh_horizon", default=0.0)
+
+# Выставляется в фоновом обновлении: устаревшие значения, из которых собирается
+# обновляемое (например, сущность в теле ответа), перестраиваются сразу
+_refreshing: ContextVar[bool] = ContextVar("refreshing", default=False)
+
+
+class CacheEntry:
+    """Значение из кеша вместе с временем и длительностью его построения"""
+
+    def __init__(
+        self, value: Any, built_at: float, build_time: float, expires_at: float
+    ):
+        self.value = value
+        self.built_at = built_at
+        self.build_time = build_time
+        self.expires_at = expires_at
+
+    def expired(self) -> bool:
+        """Истек ли TTL значения. Если включено хранение устаревших значений
+        (cache_stale_retention_in_seconds), такое значение отдается, только
+        если его не удается перестроить"""
+
+        return time.time() + refresh_horizon.get() >= self.expires_at
+
+    def needs_refresh(self, soft_expire_in_seconds: int) -> bool:
+        """Проверка, пора ли перестраивать значение.
+
+        После мягкого TTL значение устарело и перестраивается всегда, а до него -
+        с вероятностью, растущей по мере приближения к мягкому TTL и пропорциональной
+        длительности построения (вероятностное раннее обновление, XFetch).
+        """
+
+        soft_expire_at = self.built_at + soft_expire_in_seconds
+        early_refresh_gap = (
+            -self.build_time
+            * config.cache_early_refresh_beta
+            * math.log(1 - random.random())
+        )
+        return time.time() + early_refresh_gap >= soft_expire_at
+
+
 class CacheService:
-    """Имплементация класса для кеширования данных"""
+    """Имплементация класса для кеширования данных.
 
-    def __init__(self, cache: Redis, index: str):
+    dependencies - другие индексы, из которых собираются значения сервиса
+    (например, фильмографии персон - из фильмов). Все ключи сервиса получают
+    тег списков этих индексов и удаляются при изменениях в них.
+    """
+
+    def __init__(self, cache: Redis, index: str, dependencies: Iterable[str] = ()):
         self.cache = cache
         self.index = index
+        self.dependency_tags = {list_tag(dependency) for dependency in dependencies}
+        self.expire_in_seconds = config.cache_hard_expire_in_seconds.get(
+            index, config.cache_expire_in_seconds
+        )
+        self.soft_expire_in_seconds = config.cache_soft_expire_in_seconds.get(
+            index, self.expire_in_seconds
+        )
 
     async def cache_key_generation(self, **kwargs) -> str:
         """Генерация ключа для кеширования"""
@@ -34,37 +194,543 @@ class CacheService:
 
         return prepared_key
 
-    async def get(self, key) -> Any:
-        """Получение данных из кеша"""
+    async def get(self, key, model: type[BaseModel] | None = None) -> Any:
+        """Получение данных из кеша.
+
+        Если передана модель, данные возвращаются в виде объектов модели,
+        и такие объекты дополнительно сохраняются в локальном кеше процесса.
+        """
+
+        self._record_lookup(key)
+        entry = await self._get_entry(key, model)
+        if not entry or entry.expired():
+            return None
+        if isinstance(entry.value, list):
+            return list(entry.value)
+        return entry.value
+
+    async def _get_entry(
+        self, key, model: type[BaseModel] | None = None, raw: bool = False
+    ) -> CacheEntry | None:
+        if model and (entry := self._get_local(key)) is not None:
+            return entry
+
+        data = await self._read(key)
+        if not data:
+            return None
+
+        return self._to_entry(key, data, model, raw)
+
+    @staticmethod
+    def _record_lookup(key: str) -> None:
+        # Одно обращение на запрос: повторные чтения того же ключа при ожидании
+        # блокировки не должны делать его популярнее
+        if popularity_tracker:
+            popularity_tracker.record(key)
+
+    def _expire_for(self, key: str, expire_in_seconds: int | None = None) -> int:
+        """TTL ключа: популярные ключи живут дольше, редко запрашиваемые - меньше.
+        Явно переданный TTL (поиск, отрицательные записи) и TTL значений,
+        записанных не по запросам пользователей, не меняются"""
+
+        if expire_in_seconds:
+            return expire_in_seconds
+        if not popularity_tracker or not track_lookups.get():
+            return self.expire_in_seconds
+        return popularity_tracker.expire_in_seconds(key, self.expire_in_seconds)
+
+    def _get_local(self, key: str) -> Any:
+        if not local_cache:
+            return None
+
+        if (value := local_cache.get(key)) is not None:
+            cache_requests.labels(index=self.index, layer="local", result="hit").inc()
+        else:
+            cache_requests.labels(index=self.index, layer="local", result="miss").inc()
+        return value
+
+    def _to_entry(
+        self, key: str, data: bytes, model: type[BaseModel] | None, raw: bool = False
+    ) -> CacheEntry | None:
+        envelope = self._decode(key, data, model)
+        if not envelope:
+            return None
+        entry = CacheEntry(
+            envelope.data, envelope.built_at, envelope.build_time, envelope.expires_at
+        )
+
+        if not model:
+            return entry
+
+        if entry.value is not None and not raw:
+            with span("cache.validate", model=model.__name__):
+                if isinstance(entry.value, list):
+                    entry.value = [model(**item) for item in entry.value]
+                else:
+                    entry.value = model(**entry.value)
+
+        if local_cache:
+            local_cache.set(key, entry, len(data))
+
+        return entry
+
+    async def get_many(self, keys: list[str], model: type[BaseModel]) -> list[Any]:
+        """Получение данных по нескольким ключам за один запрос MGET.
+
+        Результат соответствует порядку ключей, на месте промахов - None.
+        """
+
+        values = [None] * len(keys)
+        missed = []
+        for position, key in enumerate(keys):
+            self._record_lookup(key)
+            if (entry := self._get_local(key)) is not None and not entry.expired():
+                values[position] = entry.value
+            else:
+                missed.append(position)
+
+        if not missed:
+            return values
+
+        try:
+            with span("cache.mget", keys=len(missed)):
+                found = await self.cache.mget([keys[position] for position in missed])
+        except Exception as exc:
+            a_api_logger.error(f"Ошибка при взятии значений из кеша: {exc}")
+            cache_requests.labels(index=self.index, layer="redis", result="error").inc(
+                len(missed)
+            )
+            return values
+
+        for position, data in zip(missed, found):
+            if not data:
+                cache_requests.labels(
+                    index=self.index, layer="redis", result="miss"
+                ).inc()
+                continue
+            cache_requests.labels(index=self.index, layer="redis", result="hit").inc()
+            entry = self._to_entry(keys[position], data, model)
+            if entry and not entry.expired():
+                values[position] = entry.value
+
+        return values
+
+    async def set(
+        self,
+        key,
+        value,
+        build_time: float = 0.0,
+        expire_in_seconds: int | None = None,
+        model: type[BaseModel] | None = None,
+        tags: Iterable[str] = (),
+    ) -> None:
+        """Сохранение данных в кеш. Модель нужна только для отрицательной записи
+        (None или пустого списка), по остальным значениям она определяется сама.
+        Отрицательные записи и списки не хранятся после истечения TTL:
+        устаревшими отдаются только отдельные сущности"""
+
+        try:
+            expire_in_seconds = self._expire_for(key, expire_in_seconds)
+            entry, data = self._encode(value, build_time, expire_in_seconds, model)
+            async with self.cache.pipeline(transaction=False) as pipe:
+                self._write(
+                    pipe,
+                    key,
+                    data,
+                    collect_tags(self.index, value) | set(tags) | self.dependency_tags,
+                    expire_in_seconds,
+                    retain_stale=bool(value) and not isinstance(value, list),
+                )
+                await pipe.execute()
+        except Exception as exc:
+            a_api_logger.error(f"Ошибка при записи по ключу {key} в кеш: {exc}")
+            return
+
+        if local_cache:
+            local_cache.set(key, entry, len(data))
+
+    async def set_many(
+        self,
+        values: dict[str, Any],
+        build_time: float = 0.0,
+        expire_in_seconds: int | None = None,
+        model: type[BaseModel] | None = None,
+        tags: dict[str, Iterable[str]] | None = None,
+        list_tags: bool = True,
+    ) -> None:
+        """Сохранение данных по нескольким ключам одним конвейером Redis.
+        Модель нужна для списков: пустой список иначе не связать со схемой.
+        tags - дополнительные теги по ключам; без list_tags списки не удаляются
+        при изменении любой сущности индекса, а только вместе с их сущностями"""
+
+        if not values:
+            return
+
+        try:
+            expires = {
+                key: expire_in_seconds or self._expire_for(key) for key in values
+            }
+            encoded = {
+                key: self._encode(value, build_time, expires[key], model)
+                for key, value in values.items()
+            }
+            async with self.cache.pipeline(transaction=False) as pipe:
+                for key, (_, data) in encoded.items():
+                    self._write(
+                        pipe,
+                        key,
+                        data,
+                        collect_tags(self.index, values[key], list_tags)
+                        | set((tags or {}).get(key, ()))
+                        | self.dependency_tags,
+                        expires[key],
+                        retain_stale=not isinstance(values[key], list),
+                    )
+                await pipe.execute()
+        except Exception as exc:
+            a_api_logger.error(f"Ошибка при записи значений в кеш: {exc}")
+            return
+
+        if local_cache:
+            for key, (entry, data) in encoded.items():
+                local_cache.set(key, entry, len(data))
+
+    def _write(
+        self,
+        pipe: Pipeline,
+        key: str,
+        data: bytes,
+        tags: Iterable[str],
+        expire_in_seconds: int | None = None,
+        retain_stale: bool = True,
+    ) -> None:
+        """Добавление в конвейер записи значения и его тегов для инвалидации.
+
+        С retain_stale значение хранится дольше своего TTL на
+        cache_stale_retention_in_seconds (по умолчанию 0, хранение выключено),
+        чтобы его можно было отдать, пока поисковая система недоступна.
+        Списки и результаты поиска так не хранятся: за время недоступности
+        они устаревают быстрее отдельных сущностей, а места занимают больше.
+        """
+
+        expire_in_seconds = expire_in_seconds or self.expire_in_seconds
+        if retain_stale:
+            expire_in_seconds += config.cache_stale_retention_in_seconds
+        pipe.set(key, data, ex=expire_in_seconds)
+        if not config.cache_tags_enabled:
+            return
+
+        for tag in tags:
+            pipe.sadd(tag, key)
+            # Множество тега живет не меньше самого долгоживущего ключа в нем
+            pipe.expire(tag, expire_in_seconds, nx=True)
+            pipe.expire(tag, expire_in_seconds, gt=True)
+
+    def _encode(
+        self,
+        value: Any,
+        build_time: float,
+        expire_in_seconds: int,
+        model: type[BaseModel] | None = None,
+    ) -> tuple[CacheEntry, bytes]:
+        with cache_serialization_duration.labels(
+            index=self.index, operation="encode"
+        ).time():
+            return self._encode_entry(value, build_time, expire_in_seconds, model)
+
+    @staticmethod
+    def _encode_entry(
+        value: Any,
+        build_time: float,
+        expire_in_seconds: int,
+        model: type[BaseModel] | None = None,
+    ) -> tuple[CacheEntry, bytes]:
+        built_at = time.time()
+        entry = CacheEntry(value, built_at, build_time, built_at + expire_in_seconds)
+        if value is None:
+            payload = None
+        elif isinstance(value, list):
+            payload = [item.model_dump(mode="json") for item in value]
+            model = type(value[0]) if value else model or list
+        else:
+            payload = value.model_dump(mode="json")
+            model = type(value)
+        data = codecs.encode(
+            codecs.Envelope(
+                payload,
+                codecs.schema_hash(model),
+                entry.built_at,
+                build_time,
+                entry.expires_at,
+            )
+        )
+        return entry, data
+
+    async def set_raw(
+        self,
+        key: str,
+        body: bytes,
+        response_model: Any,
+        tags: Iterable[str],
+        build_time: float = 0.0,
+        expire_in_seconds: int | None = None,
+    ) -> None:
+        """Сохранение готового тела ответа в кеш"""
 
         try:
-            data = await self.cache.get(key)
+            expire_in_seconds = self._expire_for(key, expire_in_seconds)
+            built_at = time.time()
+            entry = CacheEntry(body, built_at, build_time, built_at + expire_in_seconds)
+            data = codecs.encode(
+                codecs.Envelope(
+                    body,
+                    codecs.schema_hash(response_model),
+                    entry.built_at,
+                    build_time,
+                    entry.expires_at,
+                ),
+                raw=True,
+            )
+            async with self.cache.pipeline(transaction=False) as pipe:
+                self._write(
+                    pipe,
+                    key,
+                    data,
+                    set(tags) | self.dependency_tags,
+                    expire_in_seconds,
+                    retain_stale=False,
+                )
+                await pipe.execute()
+        except Exception as exc:
+            a_api_logger.error(f"Ошибка при записи по ключу {key} в кеш: {exc}")
+            return
+
+        if local_cache:
+            local_cache.set(key, entry, len(data))
+
+    async def _read(self, key: str) -> bytes | None:
+        try:
+            with span("cache.get", key=key):
+                data = await self.cache.get(key)
         except Exception as exc:
             a_api_logger.error(
                 f"Ошибка при взятии значения по ключу {key} из кеша: {exc}"
             )
+            cache_requests.labels(index=self.index, layer="redis", result="error").inc()
             return None
 
         if not data:
+            cache_requests.labels(index=self.index, layer="redis", result="miss").inc()
             return None
-
-        if isinstance(data := orjson.loads(data), list):
-            return [orjson.loads(item) for item in data]
+        cache_requests.labels(index=self.index, layer="redis", result="hit").inc()
         return data
 
-    async def set(self, key, value) -> None:
-        """Сохранение данных в кеш"""
+    def _decode(self, key: str, data: bytes, model: Any) -> codecs.Envelope | None:
+        try:
+            with cache_serialization_duration.labels(
+                index=self.index, operation="decode"
+            ).time():
+                envelope = codecs.decode(
+                    data, codecs.schema_hash(model) if model else None
+                )
+        except Exception as exc:
+            a_api_logger.error(
+                f"Ошибка при декодировании значения по ключу {key}: {exc}"
+            )
+            return None
+
+        if not envelope:
+            # Значение записано в устаревшем формате или для другой версии модели
+            cache_requests.labels(
+                index=self.index, layer="redis", result="outdated"
+            ).inc()
+        return envelope
+
+    async def get_or_build(
+        self,
+        key: str,
+        model: type[BaseModel],
+        build: Callable[[], Awaitable[Any]],
+        expire_in_seconds: int | None = None,
+        negative_expire_in_seconds: int | None = None,
+        negative_tags: Iterable[str] = (),
+        raw: bool = False,
+    ) -> Any:
+        """Получение данных из кеша, а при их отсутствии - вычисление через build.
+
+        Одновременные промахи по одному ключу в пределах процесса объединяются:
+        build выполняется один раз, остальные запросы ждут его результат.
+        В режиме stale-while-revalidate устаревшее значение отдается сразу,
+        а перестраивается в фоне.
+
+        Значение хранится expire_in_seconds (по умолчанию TTL индекса). Если
+        передан negative_expire_in_seconds, пустой результат (None или пустой
+        список) тоже кешируется - как отрицательная запись на этот срок и
+        с тегами negative_tags, чтобы ее удалило появление сущности.
+
+        С raw=True кешируется готовое тело ответа: model - модель ответа
+        (например, list[Films]), а build возвращает байты тела и теги значения.
+        """
+
+        options = {
+            "expire_in_seconds": expire_in_seconds,
+            "negative_expire_in_seconds": negative_expire_in_seconds,
+            "negative_tags": negative_tags,
+            "raw": raw,
+        }
+        self._record_lookup(key)
+        entry = await self._get_entry(key, model, raw)
+        if (
+            entry
+            and (entry.value or negative_expire_in_seconds)
+            and not entry.expired()
+        ):
+            if not (
+                config.cache_stale_while_revalidate
+                and entry.needs_refresh(self.soft_expire_in_seconds)
+            ):
+                return self._copy(entry.value)
+            if not _refreshing.get():
+                self._refresh_in_background(key, model, build, options)
+                return self._copy(entry.value)
 
         try:
-            if isinstance(value, list):
-                await self.cache.set(
+            return await single_flight.do(
+                key, lambda: self._build(key, model, build, **options)
+            )
+        except CircuitOpenError:
+            if not (entry and entry.value):
+                raise
+            # Поисковая система недоступна - отдаем значение с истекшим TTL
+            age = time.time() - entry.built_at
+            a_api_logger.warning(f"Отдано устаревшее значение по ключу {key}")
+            mark_stale(age)
+            return self._copy(entry.value)
+
+    @staticmethod
+    def _copy(value: Any) -> Any:
+        if isinstance(value, list):
+            return list(value)
+        return value
+
+    def _refresh_in_background(
+        self,
+        key: str,
+        model: type[BaseModel],
+        build: Callable[[], Awaitable[Any]],
+        options: dict[str, Any],
+    ) -> None:
+        async def refresh() -> None:
+            _refreshing.set(True)
+            try:
+                await single_flight.do(
                     key,
-                    orjson_dumps([item.json() for item in value], default=list),
-                    ex=config.cache_expire_in_seconds,
+                    lambda: self._build(key, model, build, refresh=True, **options),
+                )
+            except Exception as exc:
+                a_api_logger.error(
+                    f"Ошибка при фоновом обновлении значения по ключу {key}: {exc}"
                 )
+
+        task = asyncio.create_task(refresh())
+        background_tasks.add(task)
+        task.add_done_callback(background_tasks.discard)
+
+    async def _build(
+        self,
+        key: str,
+        model: type[BaseModel],
+        build: Callable[[], Awaitable[Any]],
+        refresh: bool = False,
+        expire_in_seconds: int | None = None,
+        negative_expire_in_seconds: int | None = None,
+        negative_tags: Iterable[str] = (),
+        raw: bool = False,
+    ) -> Any:
+        lock_key = f"lock::{key}"
+        lock_token = None
+
+        if config.cache_lock_enabled:
+            try:
+                lock_token = await self._acquire_lock(lock_key)
+            except Exception as exc:
+                # Redis недоступен - значение строится сразу, без ожидания
+                a_api_logger.error(f"Ошибка при захвате блокировки {lock_key}: {exc}")
             else:
-                await self.cache.set(
-                    key, value.json(), ex=config.cache_expire_in_seconds
+                if lock_token is None:
+                    # Значение уже перестраивает другой воркер
+                    if refresh:
+                        return None
+                    if entry := await self._wait_for_value(
+                        key, model, raw, bool(negative_expire_in_seconds)
+                    ):
+                        return self._copy(entry.value)
+
+        try:
+            started_at = time.monotonic()
+            value = await build()
+            build_time = time.monotonic() - started_at
+            if raw:
+                body, tags = value
+                # Ответ, собранный из устаревших данных, не кешируется как актуальный
+                if not is_stale():
+                    await self.set_raw(
+                        key, body, model, tags, build_time, expire_in_seconds
+                    )
+                return body
+            if value:
+                await self.set(key, value, build_time, expire_in_seconds)
+            elif negative_expire_in_seconds:
+                await self.set(
+                    key,
+                    value,
+                    build_time,
+                    negative_expire_in_seconds,
+                    model,
+                    negative_tags,
                 )
+            return value
+        finally:
+            if lock_token:
+                await self._release_lock(lock_key, lock_token)
+
+    async def _acquire_lock(self, lock_key: str) -> str | None:
+        """Захват блокировки в Redis, чтобы значение вычислял только один воркер.
+
+        Возвращает токен блокировки или None, если она занята другим воркером.
+        Ошибки Redis не перехватываются: их нельзя путать с занятой блокировкой.
+        """
+
+        lock_token = secrets.token_hex(16)
+        acquired = await self.cache.set(
+            lock_key,
+            lock_token,
+            nx=True,
+            px=int(config.cache_lock_timeout_in_seconds * 1000),
+        )
+        return lock_token if acquired else None
+
+    async def _release_lock(self, lock_key: str, lock_token: str) -> None:
+        # Построение могло пережить блокировку, и ее уже захватил другой воркер
+        try:
+            await self.cache.eval(RELEASE_LOCK_SCRIPT, 1, lock_key, lock_token)
         except Exception as exc:
-            a_api_logger.error(f"Ошибка при записи по ключу {key} в кеш: {exc}")
+            a_api_logger.error(f"Ошибка при снятии блокировки {lock_key}: {exc}")
+
+    async def _wait_for_value(
+        self,
+        key: str,
+        model: type[BaseModel],
+        raw: bool = False,
+        negative: bool = False,
+    ) -> CacheEntry | None:
+        """Ожидание значения, которое вычисляет воркер, захвативший блокировку.
+        С negative подходит и отрицательная запись"""
+
+        deadline = time.monotonic() + config.cache_lock_timeout_in_seconds
+        while time.monotonic() < deadline:
+            await asyncio.sleep(config.cache_lock_poll_interval_in_seconds)
+            entry = await self._get_entry(key, model, raw)
+            if entry and (entry.value or negative) and not entry.expired():
+                return entry
+        return None
@@ -0,0 +1,154 @@
+import hashlib
+import struct
+from functools import lru_cache
+from typing import Any
+
+import orjson
+from pydantic import TypeAdapter
+
+from src.core.config import config
+from src.core.logger import a_api_logger
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame
+except ImportError:
+    lz4 = None
+
+FORMAT_VERSION = 2
+
+# Версия формата, кодек, сжатие, хеш схемы модели, время и длительность построения,
+# время, после которого значение считается устаревшим
+HEADER = struct.Struct("!BBB8sddd")
+
+RAW, ORJSON, MSGPACK = 0, 1, 2
+NO_COMPRESSION, ZSTD, LZ4 = 0, 1, 2
+
+CODECS = {"raw": RAW, "orjson": ORJSON, "msgpack": MSGPACK}
+COMPRESSIONS = {"": NO_COMPRESSION, "zstd": ZSTD, "lz4": LZ4}
+
+
+class Envelope:
+    """Значение кеша вместе с метаданными формата"""
+
+    def __init__(
+        self,
+        data: Any,
+        schema_hash: bytes,
+        built_at: float,
+        build_time: float,
+        expires_at: float,
+    ):
+        self.data = data
+        self.schema_hash = schema_hash
+        self.built_at = built_at
+        self.build_time = build_time
+        self.expires_at = expires_at
+
+
+@lru_cache
+def schema_hash(model: Any) -> bytes:
+    """Хеш JSON-схемы модели: значения, записанные другой версией модели,
+    не будут прочитаны после деплоя"""
+
+    json_schema = TypeAdapter(model).json_schema()
+    return hashlib.blake2b(
+        orjson.dumps(json_schema, option=orjson.OPT_SORT_KEYS), digest_size=8
+    ).digest()
+
+
+@lru_cache
+def _available_codec() -> int:
+    codec = CODECS.get(config.cache_codec, ORJSON)
+    if codec == MSGPACK and msgpack is None:
+        a_api_logger.error("msgpack не установлен, используется orjson")
+        return ORJSON
+    return codec
+
+
+@lru_cache
+def _available_compression() -> int:
+    compression = COMPRESSIONS.get(config.cache_compression, NO_COMPRESSION)
+    if (compression == ZSTD and zstandard is None) or (
+        compression == LZ4 and lz4 is None
+    ):
+        a_api_logger.error(
+            f"{config.cache_compression} не установлен, значения кеша не сжимаются"
+        )
+        return NO_COMPRESSION
+    return compression
+
+
+def encode(envelope: Envelope, raw: bool = False) -> bytes:
+    """Сериализация значения вместе с заголовком формата"""
+
+    if raw:
+        codec, payload = RAW, envelope.data
+    else:
+        codec = _available_codec()
+        if codec == MSGPACK:
+            payload = msgpack.packb(envelope.data)
+        else:
+            payload = orjson.dumps(envelope.data)
+
+    compression = NO_COMPRESSION
+    if len(payload) >= config.cache_compression_min_bytes:
+        compression = _available_compression()
+        if compression == ZSTD:
+            payload = zstandard.ZstdCompressor().compress(payload)
+        elif compression == LZ4:
+            payload = lz4.frame.compress(payload)
+
+    header = HEADER.pack(
+        FORMAT_VERSION,
+        codec,
+        compression,
+        envelope.schema_hash,
+        envelope.built_at,
+        envelope.build_time,
+        envelope.expires_at,
+    )
+    return header + payload
+
+
+def decode(data: bytes, expected_schema_hash: bytes | None = None) -> Envelope | None:
+    """Десериализация значения; None, если формат или схема устарели"""
+
+    if len(data) < HEADER.size:
+        return None
+
+    (
+        version,
+        codec,
+        compression,
+        stored_schema_hash,
+        built_at,
+        build_time,
+        expires_at,
+    ) = HEADER.unpack_from(data)
+    if version != FORMAT_VERSION:
+        return None
+    if expected_schema_hash is not None and stored_schema_hash != expected_schema_hash:
+        return None
+
+    payload = data[HEADER.size :]
+    if compression == ZSTD:
+        payload = zstandard.ZstdDecompressor().decompress(payload)
+    elif compression == LZ4:
+        payload = lz4.frame.decompress(payload)
+
+    if codec == MSGPACK:
+        payload = msgpack.unpackb(payload)
+    elif codec == ORJSON:
+        payload = orjson.loads(payload)
+
+    return Envelope(payload, stored_schema_hash, built_at, build_time, expires_at)
@@ -1,7 +1,164 @@
+import sys
+import time
+from functools import partial
+
+from elastic_transport import ApiError, AsyncTransport, TransportError
 from elasticsearch import AsyncElasticsearch
 
+from src.core.config import config
+from src.utils.circuit_breaker import CLOSED, CircuitBreaker, CircuitOpenError
+from src.utils.metrics import CallbackGauge, elastic_request_duration
+from src.utils.profiling import body_hash, is_profiling, span
+
 es: AsyncElasticsearch | None = None
 
 
+def is_elastic_failure(exc: Exception) -> bool:
+    """Ошибки, говорящие о проблемах с кластером: сетевые ошибки, таймауты
+    и ответы 5xx. Ответы 4xx (например, документ не найден) - штатные."""
+
+    if isinstance(exc, ApiError):
+        return exc.meta.status >= 500
+    return isinstance(exc, TransportError)
+
+
+circuit_breaker = CircuitBreaker(
+    "Elasticsearch",
+    is_failure=is_elastic_failure,
+    window_size=config.elastic_breaker_window_size,
+    min_calls=config.elastic_breaker_min_calls,
+    failure_rate=config.elastic_breaker_failure_rate,
+    slow_call_in_seconds=config.elastic_breaker_slow_call_in_seconds,
+    open_in_seconds=config.elastic_breaker_open_in_seconds,
+)
+
+
+class InstrumentedTransport(AsyncTransport):
+    """Транспорт, измеряющий длительность запросов к кластеру и пропускающий
+    их через предохранитель"""
+
+    async def perform_request(self, method: str, target: str, **kwargs):
+        caller = _service_caller()
+        operation = _operation(target)
+        outcome = "ok"
+        started_at = time.perf_counter()
+        try:
+            if not is_profiling():
+                return await self._call(method, target, **kwargs)
+            with span(
+                f"es.{operation}",
+                caller=caller,
+                body_hash=body_hash(kwargs.get("body")),
+            ):
+                return await self._call(method, target, **kwargs)
+        except CircuitOpenError:
+            outcome = "circuit_open"
+            raise
+        except Exception as exc:
+            outcome = "error" if is_elastic_failure(exc) else "ok"
+            raise
+        finally:
+            elastic_request_duration.labels(
+                operation=operation, caller=caller, outcome=outcome
+            ).observe(time.perf_counter() - started_at)
+
+    async def _call(self, method: str, target: str, **kwargs):
+        if not config.elastic_breaker_enabled:
+            return await super().perform_request(method, target, **kwargs)
+        return await circuit_breaker.call(
+            partial(super().perform_request, method, target, **kwargs)
+        )
+
+
+def _operation(target: str) -> str:
+    """Тип запроса по пути: /movies/_search -> search, /movies/_doc/id -> get"""
+
+    for part in target.split("?", 1)[0].split("/"):
+        if part == "_doc":
+            return "get"
+        if part.startswith("_"):
+            return part[1:]
+    return "other"
+
+
+def _service_caller() -> str:
+    """Метод сервиса, из которого выполняется запрос: ближайший по стеку
+    кадр из services, jobs или словаря жанров"""
+
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if (
+            "/src/services/" in filename
+            or "/src/jobs/" in filename
+            or filename.endswith("/src/db/genre_dictionary.py")
+        ):
+            return frame.f_code.co_qualname.replace(".<locals>", "")
+        frame = frame.f_back
+    return "unknown"
+
+
+def create_elastic() -> AsyncElasticsearch:
+    """Создание клиента Elasticsearch с настройками пула соединений,
+    таймаутов и повторных попыток из конфигурации"""
+
+    sniffing = {}
+    if config.elastic_sniff_on_start or config.elastic_sniff_on_node_failure:
+        # min_delay_between_sniffing включает и периодический сниффинг
+        # перед запросами, поэтому передается только при включенном сниффинге
+        sniffing = {
+            "sniff_on_start": config.elastic_sniff_on_start,
+            "sniff_on_node_failure": config.elastic_sniff_on_node_failure,
+            "min_delay_between_sniffing": (
+                config.elastic_min_delay_between_sniffing_in_seconds
+            ),
+        }
+
+    return AsyncElasticsearch(
+        hosts=[f"http://{config.elastic_host}:{config.elastic_port}"],
+        connections_per_node=config.elastic_connections_per_node,
+        request_timeout=config.elastic_request_timeout_in_seconds,
+        max_retries=config.elastic_max_retries,
+        retry_on_timeout=config.elastic_retry_on_timeout,
+        dead_node_backoff_factor=config.elastic_dead_node_backoff_in_seconds,
+        max_dead_node_backoff=config.elastic_max_dead_node_backoff_in_seconds,
+        http_compress=config.elastic_http_compress,
+        transport_class=InstrumentedTransport,
+        **sniffing,
+    )
+
+
+def pool_stats() -> dict[str, int]:
+    """Загрузка пула соединений Elasticsearch по всем узлам"""
+
+    stats = {"nodes": 0, "max_connections": 0, "in_use": 0}
+    if es is None:
+        return stats
+
+    for node in es.transport.node_pool.all():
+        stats["nodes"] += 1
+        stats["max_connections"] += config.elastic_connections_per_node
+        # Сессия aiohttp создается при первом запросе к узлу
+        connector = getattr(getattr(node, "session", None), "connector", None)
+        stats["in_use"] += len(getattr(connector, "_acquired", ()))
+    return stats
+
+
+CallbackGauge(
+    "elasticsearch_pool_connections",
+    "Соединения пула Elasticsearch",
+    ("state",),
+    lambda: {(state,): value for state, value in pool_stats().items()},
+)
+
+CallbackGauge(
+    "elasticsearch_circuit_breaker_open",
+    "Разомкнут ли предохранитель Elasticsearch",
+    (),
+    lambda: {(): int(circuit_breaker.state != CLOSED)},
+    multiprocess_mode="livemax",
+)
+
+
 async def get_elastic() -> AsyncElasticsearch:
     return es
@@ -0,0 +1,90 @@
+import asyncio
+
+from elasticsearch import AsyncElasticsearch
+
+from src.core.config import config
+from src.core.logger import a_api_logger
+
+
+class GenreDictionary:
+    """Двунаправленный словарь жанров (название <-> uuid) в памяти процесса.
+
+    Каталог жанров небольшой и меняется редко, поэтому он целиком загружается
+    при старте приложения и периодически обновляется в фоне.
+    """
+
+    def __init__(self, index_name: str = "genres"):
+        self.index_name = index_name
+        self._uuid_by_name: dict[str, str] = {}
+        self._name_by_uuid: dict[str, str] = {}
+        self._refresh_task: asyncio.Task | None = None
+
+    def get_uuid(self, genre_name: str) -> str | None:
+        """Получение uuid жанра по его названию"""
+
+        return self._uuid_by_name.get(genre_name)
+
+    def get_name(self, genre_uuid: str) -> str | None:
+        """Получение названия жанра по его uuid"""
+
+        return self._name_by_uuid.get(genre_uuid)
+
+    def uuids(self) -> list[str]:
+        """uuid всех жанров словаря"""
+
+        return list(self._name_by_uuid)
+
+    def add(self, genre_uuid: str, genre_name: str) -> None:
+        """Добавление жанра, найденного в обход словаря"""
+
+        self._uuid_by_name[genre_name] = genre_uuid
+        self._name_by_uuid[genre_uuid] = genre_name
+
+    async def load(self, elastic: AsyncElasticsearch) -> None:
+        """Загрузка всех жанров из поисковой системы"""
+
+        query = {
+            "query": {"match_all": {}},
+            "size": config.genres_dictionary_max_size,
+            "_source": ["id", "name"],
+        }
+        try:
+            response = await elastic.search(index=self.index_name, body=query)
+        except Exception as exc:
+            a_api_logger.error(f"Ошибка при загрузке словаря жанров: {exc}")
+            return
+
+        uuid_by_name = {}
+        name_by_uuid = {}
+        for hit in response["hits"]["hits"]:
+            genre = hit["_source"]
+            uuid_by_name[genre["name"]] = genre["id"]
+            name_by_uuid[genre["id"]] = genre["name"]
+
+        self._uuid_by_name = uuid_by_name
+        self._name_by_uuid = name_by_uuid
+        a_api_logger.info(f"Словарь жанров загружен: {len(name_by_uuid)} жанров")
+
+    def start_refresh(self, elastic: AsyncElasticsearch) -> None:
+        """Запуск фонового обновления словаря"""
+
+        self._refresh_task = asyncio.create_task(self._refresh_periodically(elastic))
+
+    async def stop_refresh(self) -> None:
+        """Остановка фонового обновления словаря"""
+
+        if self._refresh_task:
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except asyncio.CancelledError:
+                pass
+            self._refresh_task = None
+
+    async def _refresh_periodically(self, elastic: AsyncElasticsearch) -> None:
+        while True:
+            await asyncio.sleep(config.genres_dictionary_refresh_in_seconds)
+            await self.load(elastic)
+
+
+genre_dictionary = GenreDictionary()
@@ -0,0 +1,366 @@
+"""Фильтр известных id фильмов, жанров и персон.
+
+Для каждого индекса в Redis хранится фильтр Блума со всеми id документов.
+Каждый воркер держит его копию в памяти. Фильтр проверяется после промаха
+кеша: по неизвестному id сервис не обращается к поисковой системе, а
+кеширует отрицательную запись на короткий срок. Ложноположительные ответы
+возможны (с вероятностью id_filter_error_rate), ложноотрицательные - нет.
+
+Фильтр перестраивается из поисковой системы по расписанию одним воркером
+и пополняется новыми id по событиям инвалидации. Каждое изменение
+увеличивает версию фильтра в Redis и рассылается через pub/sub вместе с ней,
+чтобы остальные воркеры обновили свои копии. Воркер применяет изменения по
+порядку версий и перечитывает карту целиком, только если пропустил
+изменение или фильтр перестроен. Пока фильтр индекса не построен целиком
+и не загружен, все id считаются известными.
+"""
+
+import asyncio
+import math
+from typing import AsyncIterator, Iterable
+
+import orjson
+from elasticsearch import AsyncElasticsearch
+from redis.asyncio import Redis
+
+from src.core.config import config
+from src.core.logger import a_api_logger
+from src.utils.hashing import hash_positions
+from src.utils.metrics import id_filter_lookups
+from src.utils.pagination import apply_search_after
+
+LOCK_KEY = "lock::id_filter"
+
+# Биты выставляются в строящейся карте всегда, а в текущей - только если она
+# построена целиком: иначе почти пустая карта отсекала бы существующие id.
+# Возвращает новую версию фильтра или 0, если текущая карта не изменена
+ADD_IDS_SCRIPT = """
+for i = 1, #ARGV do
+    redis.call("setbit", KEYS[2], ARGV[i], 1)
+end
+if redis.call("exists", KEYS[1], KEYS[3]) < 2 then
+    return 0
+end
+for i = 1, #ARGV do
+    redis.call("setbit", KEYS[1], ARGV[i], 1)
+end
+return redis.call("incr", KEYS[4])
+"""
+
+
+class BloomFilter:
+    """Параметры фильтра Блума и работа с его битовой картой.
+
+    Нумерация битов совпадает с SETBIT/GETBIT в Redis: бит 0 - старший бит
+    первого байта, поэтому карту можно читать и менять как в Redis, так и
+    в памяти процесса.
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.size = max(
+            math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2), 8
+        )
+        self.hashes = max(round(self.size / capacity * math.log(2)), 1)
+
+    def positions(self, item: str) -> list[int]:
+        return hash_positions(item, self.hashes, self.size)
+
+    def new_bitmap(self) -> bytearray:
+        return bytearray((self.size + 7) // 8)
+
+    @staticmethod
+    def set_bits(bitmap: bytearray, positions: Iterable[int]) -> None:
+        for position in positions:
+            bitmap[position >> 3] |= 0x80 >> (position & 7)
+
+    @staticmethod
+    def test(bitmap: bytes, positions: Iterable[int]) -> bool:
+        return all(
+            bitmap[position >> 3] & (0x80 >> (position & 7)) for position in positions
+        )
+
+
+class IdFilter:
+    def __init__(self, redis: Redis, elastic: AsyncElasticsearch, listener: Redis):
+        self.redis = redis
+        self.listener = listener
+        self.elastic = elastic
+        self.filters = {
+            index: BloomFilter(capacity, config.id_filter_error_rate)
+            for index, capacity in config.id_filter_capacity.items()
+        }
+        self._bitmaps: dict[str, bytearray] = {}
+        self._versions: dict[str, int] = {}
+        self._tasks: list[asyncio.Task] = []
+
+    def key(self, index: str) -> str:
+        # Параметры фильтра входят в ключ: после их изменения старая карта
+        # не читается, а фильтр перестраивается заново
+        bloom = self.filters[index]
+        return f"id_filter::{index}::{bloom.size}::{bloom.hashes}"
+
+    def version_key(self, index: str) -> str:
+        return f"{self.key(index)}::version"
+
+    def ready_key(self, index: str) -> str:
+        # Отметка о том, что карта построена по всем документам индекса
+        return f"{self.key(index)}::ready"
+
+    def might_contain(self, index: str, entity_id: str) -> bool:
+        """False, если сущности с таким id в индексе точно нет"""
+
+        bitmap = self._bitmaps.get(index)
+        if bitmap is None:
+            return True
+
+        known = BloomFilter.test(bitmap, self.filters[index].positions(entity_id))
+        id_filter_lookups.labels(
+            index=index, result="passed" if known else "rejected"
+        ).inc()
+        return known
+
+    async def load(self, index: str) -> None:
+        """Загрузка копии фильтра индекса из Redis"""
+
+        try:
+            version, ready, data = await self.redis.mget(
+                self.version_key(index), self.ready_key(index), self.key(index)
+            )
+        except Exception as exc:
+            a_api_logger.error(f"Ошибка при загрузке фильтра id {index}: {exc}")
+            return
+
+        if data is None or ready is None:
+            self._bitmaps.pop(index, None)
+            self._versions.pop(index, None)
+            return
+
+        bitmap = self.filters[index].new_bitmap()
+        bitmap[: len(data)] = data[: len(bitmap)]
+        self._bitmaps[index] = bitmap
+        self._versions[index] = int(version or 0)
+
+    async def load_changed(self) -> None:
+        """Загрузка фильтров, версия которых в Redis отличается от загруженной"""
+
+        try:
+            versions = await self.redis.mget(
+                [self.version_key(index) for index in self.filters]
+            )
+        except Exception as exc:
+            a_api_logger.error(f"Ошибка при проверке версий фильтров id: {exc}")
+            return
+
+        for index, version in zip(self.filters, versions):
+            if int(version or 0) != self._versions.get(index, 0):
+                await self.load(index)
+
+    async def add(self, index: str, entity_ids: list[str]) -> None:
+        """Добавление новых id в фильтр индекса.
+
+        Биты выставляются в карте, которая может сейчас строиться (ключ
+        с суффиксом ::next), поэтому id, добавленные во время перестроения,
+        не теряются, и в текущей карте, если она уже построена.
+        """
+
+        if index not in self.filters:
+            return
+
+        bloom = self.filters[index]
+        key = self.key(index)
+        positions = [
+            position
+            for entity_id in entity_ids
+            for position in bloom.positions(entity_id)
+        ]
+        try:
+            version = await self.redis.eval(
+                ADD_IDS_SCRIPT,
+                4,
+                key,
+                f"{key}::next",
+                self.ready_key(index),
+                self.version_key(index),
+                *positions,
+            )
+            if not version:
+                return
+            await self.redis.publish(
+                config.id_filter_channel,
+                orjson.dumps({"index": index, "ids": entity_ids, "version": version}),
+            )
+        except Exception as exc:
+            a_api_logger.error(f"Ошибка при добавлении id в фильтр {index}: {exc}")
+
+    async def _apply(self, change: dict) -> None:
+        """Применение изменения фильтра, полученного через pub/sub"""
+
+        index = change["index"]
+        if index not in self.filters:
+            return
+
+        version = change.get("version")
+        current = self._versions.get(index)
+        if version is None:
+            # Сообщение воркера предыдущей версии приложения
+            await self.load(index)
+            return
+        if change.get("reload"):
+            # Фильтр перестроен (или версия в Redis начата заново)
+            if version != current:
+                await self.load(index)
+            return
+
+        if current is not None and version <= current:
+            # Изменение уже вошло в загруженную карту
+            return
+        if current is None or version != current + 1:
+            # Пропущено изменение - карта читается заново
+            await self.load(index)
+            return
+
+        bloom = self.filters[index]
+        for entity_id in change["ids"]:
+            BloomFilter.set_bits(self._bitmaps[index], bloom.positions(entity_id))
+        self._versions[index] = version
+
+    async def rebuild(self, index: str) -> int:
+        """Построение фильтра индекса по всем документам поисковой системы.
+        Возвращает количество id в фильтре"""
+
+        bloom = self.filters[index]
+        key = self.key(index)
+        await self.redis.delete(f"{key}::next")
+
+        bitmap = bloom.new_bitmap()
+        count = 0
+        async for entity_id in self._iter_ids(index):
+            BloomFilter.set_bits(bitmap, bloom.positions(entity_id))
+            count += 1
+
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.set(f"{key}::built", bytes(bitmap))
+            pipe.bitop("OR", f"{key}::next", f"{key}::next", f"{key}::built")
+            pipe.rename(f"{key}::next", key)
+            pipe.delete(f"{key}::built")
+            pipe.set(self.ready_key(index), 1)
+            pipe.incr(self.version_key(index))
+            version = (await pipe.execute())[-1]
+        await self.redis.publish(
+            config.id_filter_channel,
+            orjson.dumps({"index": index, "reload": True, "version": version}),
+        )
+
+        capacity = config.id_filter_capacity[index]
+        if count > capacity:
+            a_api_logger.warning(
+                f"В индексе {index} {count} id при емкости фильтра {capacity}: "
+                "доля ложноположительных ответов выше заданной"
+            )
+        a_api_logger.info(f"Фильтр id {index} перестроен: {count} id")
+        return count
+
+    async def _iter_ids(self, index: str) -> AsyncIterator[str]:
+        """Обход всех id индекса страницами через search_after"""
+
+        search_after = None
+        while True:
+            query = apply_search_after(
+                {
+                    "query": {"match_all": {}},
+                    "size": config.id_filter_batch_size,
+                    "_source": False,
+                },
+                search_after,
+            )
+            hits = (await self.elastic.search(index=index, body=query))["hits"]["hits"]
+            for hit in hits:
+                yield hit["_id"]
+
+            if len(hits) < config.id_filter_batch_size:
+                return
+            search_after = hits[-1]["sort"]
+
+    def start(self) -> None:
+        """Запуск фонового перестроения фильтров и получения их изменений"""
+
+        self._tasks = [
+            asyncio.create_task(self._listen()),
+            asyncio.create_task(self._rebuild_periodically()),
+        ]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _listen(self) -> None:
+        """Применение изменений фильтров, сделанных другими воркерами"""
+
+        while True:
+            pubsub = self.listener.pubsub()
+            try:
+                await pubsub.subscribe(config.id_filter_channel)
+                # Изменения, сделанные до подписки, могли быть пропущены
+                await self.load_changed()
+
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    await self._apply(orjson.loads(message["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                a_api_logger.error(f"Ошибка при получении изменений фильтра id: {exc}")
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+    async def _rebuild_periodically(self) -> None:
+        # При первом запуске строятся только отсутствующие в Redis фильтры
+        missing_only = True
+        while True:
+            await self.run(missing_only)
+            missing_only = False
+            await asyncio.sleep(config.id_filter_rebuild_interval_in_seconds)
+
+    async def run(self, missing_only: bool = False) -> None:
+        """Перестроение фильтров, если его сейчас не выполняет другой воркер"""
+
+        try:
+            if not await self.redis.set(
+                LOCK_KEY,
+                1,
+                nx=True,
+                px=int(config.id_filter_rebuild_interval_in_seconds * 900),
+            ):
+                return
+        except Exception as exc:
+            a_api_logger.error(f"Ошибка при захвате блокировки фильтра id: {exc}")
+            return
+
+        for index in self.filters:
+            try:
+                if missing_only and (
+                    await self.redis.exists(self.key(index), self.ready_key(index)) == 2
+                ):
+                    continue
+                await self.rebuild(index)
+            except Exception as exc:
+                a_api_logger.error(f"Ошибка при перестроении фильтра id {index}: {exc}")
+
+
+id_filter: IdFilter | None = None
+
+
+def might_exist(index: str, entity_id: str) -> bool:
+    """Проверка по фильтру id, что сущность может существовать.
+    True, если фильтр отключен или еще не загружен"""
+
+    return id_filter is None or id_filter.might_contain(index, entity_id)
+
+
+async def add_ids(index: str, entity_ids: list[str]) -> None:
+    if id_filter:
+        await id_filter.add(index, entity_ids)
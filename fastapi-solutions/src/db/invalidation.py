@@ -0,0 +1,252 @@
+import asyncio
+import os
+from typing import Any
+
+import orjson
+from pydantic import BaseModel
+from redis.asyncio import Redis
+from redis.exceptions import ResponseError
+
+from src.core.config import config
+from src.core.logger import a_api_logger
+from src.db.id_filter import add_ids
+from src.db.local_cache import local_cache
+
+
+def entity_tag(entity_id: Any) -> str:
+    """Тег ключей, значения которых содержат сущность с entity_id"""
+
+    return f"tag::entity::{entity_id}"
+
+
+def list_tag(index: str) -> str:
+    """Тег ключей со списками сущностей индекса: любое изменение в индексе
+    может изменить состав или порядок списка"""
+
+    return f"tag::list::{index}"
+
+
+def collect_tags(index: str, value: Any, lists: bool = True) -> set[str]:
+    """Получение тегов для значения кеша по uuid всех вложенных моделей.
+    Без lists список не получает тег списков индекса"""
+
+    tags = set()
+    if lists and isinstance(value, list):
+        tags.add(list_tag(index))
+    _collect_entity_tags(value, tags)
+    return tags
+
+
+def _collect_entity_tags(value: Any, tags: set[str]) -> None:
+    if isinstance(value, BaseModel):
+        if (entity_id := getattr(value, "uuid", None)) is not None:
+            tags.add(entity_tag(entity_id))
+        for field_name in value.model_fields:
+            _collect_entity_tags(getattr(value, field_name), tags)
+    elif isinstance(value, list):
+        for item in value:
+            _collect_entity_tags(item, tags)
+
+
+class CacheInvalidator:
+    """Инвалидация кеша по событиям изменения фильмов, жанров и персон.
+
+    События читаются из Redis Stream через группу потребителей, поэтому каждое
+    событие обрабатывает ровно один воркер. Удаленные ключи рассылаются через
+    pub/sub, чтобы все воркеры убрали их из локального кеша процесса.
+    Ожидание событий и сообщений идет через отдельный клиент listener.
+    """
+
+    def __init__(self, redis: Redis, listener: Redis):
+        self.redis = redis
+        self.listener = listener
+        self.consumer_name = f"{os.uname().nodename}-{os.getpid()}"
+        self._tasks: list[asyncio.Task] = []
+
+    async def invalidate(
+        self, index: str, entity_ids: list[str], lists: bool = True
+    ) -> int:
+        """Удаление всех ключей, зависящих от переданных сущностей индекса.
+        Их id добавляются в фильтр известных id: сущность могла быть создана.
+
+        Списки индекса удаляются целиком, только если lists: изменение, не
+        влияющее на состав и порядок списков, затрагивает лишь списки, в
+        которых есть сами сущности. Ключи удаляются частями через UNLINK.
+        """
+
+        # Теги строятся по uuid моделей, а они всегда в нижнем регистре
+        entity_ids = [entity_id.lower() for entity_id in entity_ids]
+        await add_ids(index, entity_ids)
+
+        tags = [entity_tag(entity_id) for entity_id in entity_ids]
+        if lists:
+            tags.append(list_tag(index))
+
+        invalidated = set()
+        chunk = []
+        for tag in tags:
+            async for key in self.redis.sscan_iter(
+                tag, count=config.cache_invalidation_batch_size
+            ):
+                if key in invalidated:
+                    continue
+                invalidated.add(key)
+                chunk.append(key)
+                if len(chunk) >= config.cache_invalidation_batch_size:
+                    await self._unlink(chunk)
+                    chunk = []
+        await self._unlink(chunk)
+        await self.redis.unlink(*tags)
+
+        a_api_logger.info(
+            f"Инвалидировано {len(invalidated)} ключей кеша для {index}: {entity_ids}"
+        )
+        return len(invalidated)
+
+    async def _unlink(self, keys: list[bytes]) -> None:
+        if not keys:
+            return
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.unlink(*keys)
+            pipe.publish(
+                config.cache_invalidation_channel,
+                orjson.dumps([key.decode() for key in keys]),
+            )
+            await pipe.execute()
+
+    def start(self) -> None:
+        """Запуск фоновых обработчиков событий инвалидации"""
+
+        self._tasks = [
+            asyncio.create_task(self._consume_events()),
+            asyncio.create_task(self._drop_local_keys()),
+        ]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _consume_events(self) -> None:
+        """Чтение событий изменения сущностей из Redis Stream.
+
+        Событие содержит поля index, ids (uuid сущностей через запятую) и
+        необязательное lists ("0", если списки индекса не затронуты). Перед
+        чтением новых событий забираются события, которые другой воркер
+        получил, но не подтвердил дольше cache_invalidation_claim_idle_in_seconds.
+        """
+
+        stream = config.cache_invalidation_stream
+        group = config.cache_invalidation_group
+        group_created = False
+        claim_from = "0-0"
+
+        while True:
+            try:
+                if not group_created:
+                    await self._create_group(stream, group)
+                    group_created = True
+
+                claim_from, messages, *_ = await self.redis.xautoclaim(
+                    stream,
+                    group,
+                    self.consumer_name,
+                    min_idle_time=config.cache_invalidation_claim_idle_in_seconds
+                    * 1000,
+                    start_id=claim_from,
+                    count=100,
+                )
+                for message_id, fields in messages:
+                    await self._handle_event(stream, group, message_id, fields)
+
+                response = await self.listener.xreadgroup(
+                    group,
+                    self.consumer_name,
+                    {stream: ">"},
+                    count=100,
+                    block=5000,
+                )
+                for _, messages in response:
+                    for message_id, fields in messages:
+                        await self._handle_event(stream, group, message_id, fields)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                a_api_logger.error(f"Ошибка при обработке событий инвалидации: {exc}")
+                await asyncio.sleep(1)
+
+    async def _handle_event(
+        self, stream: str, group: str, message_id: bytes, fields: dict
+    ) -> None:
+        """Обработка одного события. Некорректное событие подтверждается и
+        пропускается, событие с ошибкой инвалидации остается неподтвержденным
+        и будет повторено"""
+
+        try:
+            index = fields[b"index"].decode()
+            entity_ids = [
+                entity_id
+                for entity_id in fields[b"ids"].decode().split(",")
+                if entity_id
+            ]
+            lists = fields.get(b"lists", b"1") != b"0"
+        except (KeyError, UnicodeDecodeError) as exc:
+            a_api_logger.error(
+                f"Пропущено некорректное событие инвалидации {message_id}: {exc}"
+            )
+            await self.redis.xack(stream, group, message_id)
+            return
+
+        try:
+            await self.invalidate(index, entity_ids, lists)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            a_api_logger.error(
+                f"Ошибка при обработке события инвалидации {message_id}: {exc}"
+            )
+            return
+        await self.redis.xack(stream, group, message_id)
+
+    async def _create_group(self, stream: str, group: str) -> None:
+        try:
+            await self.redis.xgroup_create(stream, group, id="$", mkstream=True)
+        except ResponseError as exc:
+            if "BUSYGROUP" not in str(exc):
+                raise
+
+    async def _drop_local_keys(self) -> None:
+        """Удаление инвалидированных ключей из локального кеша процесса"""
+
+        if not local_cache:
+            return
+
+        while True:
+            pubsub = self.listener.pubsub()
+            try:
+                await pubsub.subscribe(config.cache_invalidation_channel)
+                # Пока подписки не было, инвалидации могли быть пропущены
+                local_cache.clear()
+
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    for key in orjson.loads(message["data"]):
+                        local_cache.delete(key)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                a_api_logger.error(
+                    f"Ошибка при получении инвалидированных ключей: {exc}"
+                )
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+
+cache_invalidator: CacheInvalidator | None = None
+
+
+async def get_cache_invalidator() -> CacheInvalidator:
+    return cache_invalidator
@@ -0,0 +1,102 @@
+import time
+from collections import OrderedDict
+from typing import Any
+
+from src.core.config import config
+from src.db.popularity import PopularityTracker, popularity_tracker
+
+
+class LocalCache:
+    """LRU-кеш в памяти процесса с ограничением по объему и временем жизни записей.
+
+    Хранит уже собранные объекты моделей, поэтому попадание в этот кеш не требует
+    ни обращения к Redis, ни десериализации. Объем записи оценивается по размеру
+    ее сериализованного представления в Redis.
+
+    Если передан счетчик популярности, новая запись, ради которой пришлось бы
+    вытеснить другие, допускается в кеш только когда к ней обращались чаще,
+    чем к вытесняемым (TinyLFU). Так редкие запросы не вымывают популярные.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        expire_in_seconds: int,
+        admission: PopularityTracker | None = None,
+    ):
+        self.max_bytes = max_bytes
+        self.expire_in_seconds = expire_in_seconds
+        self.admission = admission
+        self.size_in_bytes = 0
+        self._entries: OrderedDict[str, tuple[float, int, Any]] = OrderedDict()
+
+    def get(self, key: str) -> Any:
+        """Получение значения по ключу, None если ключа нет или он устарел"""
+
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, _, value = entry
+        if expires_at < time.monotonic():
+            self.delete(key)
+            return None
+
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any, size_in_bytes: int) -> None:
+        """Сохранение значения с вытеснением давно не использованных записей"""
+
+        if size_in_bytes > self.max_bytes:
+            return
+
+        self.delete(key)
+        if self.admission and not self._admit(key, size_in_bytes):
+            return
+
+        self._entries[key] = (
+            time.monotonic() + self.expire_in_seconds,
+            size_in_bytes,
+            value,
+        )
+        self.size_in_bytes += size_in_bytes
+
+        while self.size_in_bytes > self.max_bytes:
+            _, (_, evicted_size, _) = self._entries.popitem(last=False)
+            self.size_in_bytes -= evicted_size
+
+    def _admit(self, key: str, size_in_bytes: int) -> bool:
+        free_bytes = self.max_bytes - self.size_in_bytes
+        if free_bytes >= size_in_bytes:
+            return True
+
+        frequency = self.admission.frequency(key)
+        now = time.monotonic()
+        for victim, (expires_at, victim_size, _) in self._entries.items():
+            if expires_at >= now and self.admission.frequency(victim) >= frequency:
+                return False
+            free_bytes += victim_size
+            if free_bytes >= size_in_bytes:
+                return True
+        return True
+
+    def delete(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size_in_bytes -= entry[1]
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.size_in_bytes = 0
+
+
+local_cache: LocalCache | None = (
+    LocalCache(
+        config.local_cache_max_bytes,
+        config.local_cache_expire_in_seconds,
+        popularity_tracker,
+    )
+    if config.local_cache_enabled
+    else None
+)
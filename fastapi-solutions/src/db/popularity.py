@@ -0,0 +1,133 @@
+from array import array
+from contextvars import ContextVar
+from typing import Iterable
+
+from src.core.config import config
+from src.utils.hashing import hash_positions
+
+# Обращения к кешу не от пользователей (например, при прогреве)
+# не должны влиять на популярность ключей
+track_lookups: ContextVar[bool] = ContextVar("track_lookups", default=True)
+
+
+class CountMinSketch:
+    """Приблизительный счетчик частоты ключей в фиксированном объеме памяти.
+
+    Оценка частоты не бывает меньше настоящей и превышает ее только из-за
+    коллизий. Когда число учтенных обращений достигает sample_size, все
+    счетчики делятся пополам, поэтому оценка отражает недавнюю популярность.
+    """
+
+    def __init__(self, width: int, depth: int, sample_size: int):
+        self.width = width
+        self.depth = depth
+        self.sample_size = sample_size
+        self.samples = 0
+        self._rows = [array("I", [0]) * width for _ in range(depth)]
+
+    def _positions(self, key: str) -> Iterable[tuple[array, int]]:
+        return zip(self._rows, hash_positions(key, self.depth, self.width))
+
+    def add(self, key: str) -> int:
+        """Учет обращения к ключу. Возвращает новую оценку его частоты"""
+
+        positions = list(self._positions(key))
+        estimate = min(row[position] for row, position in positions) + 1
+        # Увеличиваются только минимальные счетчики (conservative update),
+        # это уменьшает завышение оценок от коллизий
+        for row, position in positions:
+            if row[position] < estimate:
+                row[position] = estimate
+
+        self.samples += 1
+        if self.samples >= self.sample_size:
+            self._age()
+        return estimate
+
+    def estimate(self, key: str) -> int:
+        return min(row[position] for row, position in self._positions(key))
+
+    def _age(self) -> None:
+        self._rows = [array("I", (value >> 1 for value in row)) for row in self._rows]
+        self.samples //= 2
+
+
+class PopularityTracker:
+    """Популярность ключей кеша по обращениям к ним.
+
+    По оценке частоты подбирается TTL ключа и решается, стоит ли пускать его
+    в локальный кеш (TinyLFU). Также отслеживаются самые популярные ключи.
+    """
+
+    def __init__(
+        self,
+        width: int,
+        depth: int,
+        sample_size: int,
+        hot_keys_size: int,
+    ):
+        self.sketch = CountMinSketch(width, depth, sample_size)
+        self.hot_keys_size = hot_keys_size
+        self._hot_keys: dict[str, int] = {}
+        self._hot_keys_threshold = 0
+
+    def record(self, key: str) -> None:
+        if not track_lookups.get():
+            return
+
+        aged = self.sketch.samples + 1 >= self.sketch.sample_size
+        frequency = self.sketch.add(key)
+        if aged:
+            self._hot_keys = {
+                hot_key: count >> 1 for hot_key, count in self._hot_keys.items()
+            }
+            self._hot_keys_threshold >>= 1
+        self._update_hot_keys(key, frequency)
+
+    def frequency(self, key: str) -> int:
+        return self.sketch.estimate(key)
+
+    def _update_hot_keys(self, key: str, frequency: int) -> None:
+        if key in self._hot_keys or len(self._hot_keys) < self.hot_keys_size:
+            self._hot_keys[key] = frequency
+            return
+        if frequency <= self._hot_keys_threshold:
+            return
+
+        coldest = min(self._hot_keys, key=self._hot_keys.__getitem__)
+        if frequency > self._hot_keys[coldest]:
+            del self._hot_keys[coldest]
+            self._hot_keys[key] = frequency
+        self._hot_keys_threshold = min(self._hot_keys.values())
+
+    def hot_keys(self, limit: int) -> list[tuple[str, int]]:
+        """Самые популярные ключи с оценкой частоты обращений"""
+
+        return sorted(self._hot_keys.items(), key=lambda item: -item[1])[:limit]
+
+    def expire_in_seconds(self, key: str, base_expire_in_seconds: int) -> int:
+        """TTL ключа с учетом популярности: от min_ttl_factor базового TTL для
+        ключей, к которым почти не обращаются, до max_ttl_factor для ключей
+        с частотой hot_frequency и выше. Частота учитывается логарифмически."""
+
+        frequency = min(self.frequency(key), config.cache_popularity_hot_frequency)
+        hotness = (
+            frequency.bit_length() / config.cache_popularity_hot_frequency.bit_length()
+        )
+        factor = config.cache_popularity_min_ttl_factor + hotness * (
+            config.cache_popularity_max_ttl_factor
+            - config.cache_popularity_min_ttl_factor
+        )
+        return max(int(base_expire_in_seconds * factor), 1)
+
+
+popularity_tracker: PopularityTracker | None = (
+    PopularityTracker(
+        config.cache_popularity_sketch_width,
+        config.cache_popularity_sketch_depth,
+        config.cache_popularity_sample_size,
+        config.cache_popularity_hot_keys_size,
+    )
+    if config.cache_popularity_enabled
+    else None
+)
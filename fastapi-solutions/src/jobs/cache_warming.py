@@ -0,0 +1,238 @@
+"""Прогрев кеша.
+
+При старте API и затем по расписанию в кеш заранее записываются первые
+страницы списка фильмов для каждой сортировки и каждого жанра, список жанров
+и полная информация о фильмах с наибольшим рейтингом. Значения, которые
+истекут до следующего прогрева, перестраиваются заранее. Из нескольких
+воркеров прогрев выполняет тот, кто захватил блокировку в Redis.
+
+Разовый прогрев: python -m src.jobs.cache_warming
+"""
+
+import asyncio
+import math
+import time
+import uuid
+from collections import Counter, defaultdict
+from functools import partial
+from typing import Any, Awaitable, Callable
+
+from elasticsearch import AsyncElasticsearch
+from redis.asyncio import Redis
+
+from src.core.config import config
+from src.core.logger import a_api_logger
+from src.db.cache import create_redis, refresh_horizon
+from src.db.elastic import create_elastic
+from src.db.genre_dictionary import genre_dictionary
+from src.db.popularity import track_lookups
+from src.services.film import FilmService
+from src.services.genre import GenreService
+from src.utils.fan_out import fan_out
+from src.utils.metrics import cache_warming_duration, cache_warming_items
+
+LOCK_KEY = "lock::cache_warming"
+
+
+class CacheWarmer:
+    def __init__(self, redis: Redis, elastic: AsyncElasticsearch):
+        self.redis = redis
+        self.elastic = elastic
+        self.genre_service = GenreService(redis, elastic)
+        self.film_service = FilmService(redis, elastic, self.genre_service)
+        self._task: asyncio.Task | None = None
+
+    def start(self, delay_in_seconds: float = 0.0) -> None:
+        """Запуск прогрева по расписанию"""
+
+        self._task = asyncio.create_task(self._warm_periodically(delay_in_seconds))
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _warm_periodically(self, delay_in_seconds: float) -> None:
+        await asyncio.sleep(delay_in_seconds)
+        while True:
+            await self.run()
+            await asyncio.sleep(config.cache_warming_interval_in_seconds)
+
+    async def run(self) -> dict[str, Counter] | None:
+        """Прогрев, если его сейчас не выполняет другой воркер"""
+
+        if not await self._acquire_lock():
+            return None
+        try:
+            return await self.warm()
+        except Exception as exc:
+            a_api_logger.error(f"Ошибка при прогреве кеша: {exc}")
+            return None
+
+    async def _acquire_lock(self) -> bool:
+        # Блокировка истекает чуть раньше следующего запуска по расписанию
+        try:
+            return bool(
+                await self.redis.set(
+                    LOCK_KEY,
+                    1,
+                    nx=True,
+                    px=int(config.cache_warming_interval_in_seconds * 900),
+                )
+            )
+        except Exception as exc:
+            a_api_logger.error(f"Ошибка при захвате блокировки прогрева кеша: {exc}")
+            return False
+
+    async def warm(self) -> dict[str, Counter]:
+        """Прогрев кеша. Возвращает число успешных и неудачных
+        обращений по типам значений"""
+
+        started_at = time.monotonic()
+        token = refresh_horizon.set(config.cache_warming_interval_in_seconds)
+        tracking_token = track_lookups.set(False)
+        try:
+            items = [
+                *self._genre_items(),
+                *self._film_list_items(),
+                *await self._top_film_items(),
+            ]
+            report = await self._warm_items(items)
+        finally:
+            track_lookups.reset(tracking_token)
+            refresh_horizon.reset(token)
+
+        duration = time.monotonic() - started_at
+        cache_warming_duration.labels().observe(duration)
+        a_api_logger.info(
+            f"Прогрев кеша завершен за {duration:.1f} с: "
+            + ", ".join(
+                f"{kind} {counts['ok']}/{counts['ok'] + counts['error']}"
+                for kind, counts in report.items()
+            )
+        )
+        return report
+
+    def _genre_items(self) -> list[tuple[str, Callable[[], Awaitable[Any]]]]:
+        genre_uuids = genre_dictionary.uuids()
+        pages = max(math.ceil(len(genre_uuids) / config.page_size), 1)
+        items = [
+            (
+                "genres_page",
+                partial(self.genre_service.get_genres, page, config.page_size),
+            )
+            for page in range(1, pages + 1)
+        ]
+        if genre_uuids:
+            items.append(
+                ("genres", partial(self.genre_service.get_genres_by_ids, genre_uuids))
+            )
+        return items
+
+    def _film_list_items(self) -> list[tuple[str, Callable[[], Awaitable[Any]]]]:
+        genres = [None, *(uuid.UUID(value) for value in genre_dictionary.uuids())]
+        return [
+            (
+                "films_page",
+                partial(
+                    self.film_service.get_all_films_from_elastic,
+                    genre,
+                    sort,
+                    page,
+                    config.page_size,
+                ),
+            )
+            for sort in config.cache_warming_sorts
+            for genre in genres
+            for page in range(1, config.cache_warming_pages + 1)
+        ]
+
+    async def _top_film_items(self) -> list[tuple[str, Callable[[], Awaitable[Any]]]]:
+        """Полная информация о фильмах с наибольшим рейтингом, партиями
+        по batch_max_size фильмов"""
+
+        if not config.cache_warming_top_films:
+            return []
+
+        try:
+            response = await self.elastic.search(
+                index=self.film_service.index_name,
+                body={
+                    "query": {"match_all": {}},
+                    "sort": [{"imdb_rating": {"order": "desc"}}],
+                    "size": config.cache_warming_top_films,
+                    "_source": False,
+                },
+            )
+        except Exception as exc:
+            a_api_logger.error(f"Ошибка при получении фильмов для прогрева: {exc}")
+            cache_warming_items.labels(kind="films", result="error").inc()
+            return []
+
+        film_ids = [hit["_id"] for hit in response["hits"]["hits"]]
+        return [
+            (
+                "films",
+                partial(
+                    self.film_service.get_films_details,
+                    film_ids[start : start + config.batch_max_size],
+                ),
+            )
+            for start in range(0, len(film_ids), config.batch_max_size)
+        ]
+
+    async def _warm_items(
+        self, items: list[tuple[str, Callable[[], Awaitable[Any]]]]
+    ) -> dict[str, Counter]:
+        done = 0
+        next_report = 0.25
+
+        async def warm_item(call: Callable[[], Awaitable[Any]]) -> Any:
+            nonlocal done, next_report
+            try:
+                return await call()
+            finally:
+                done += 1
+                if done >= next_report * len(items):
+                    a_api_logger.info(f"Прогрев кеша: {done}/{len(items)}")
+                    next_report += 0.25
+
+        results = await fan_out(
+            (partial(warm_item, call) for _, call in items),
+            limit=config.cache_warming_concurrency,
+            timeout=config.cache_warming_timeout_in_seconds,
+            return_exceptions=True,
+        )
+
+        report: dict[str, Counter] = defaultdict(Counter)
+        for (kind, _), result in zip(items, results):
+            if isinstance(result, BaseException):
+                a_api_logger.error(f"Ошибка при прогреве кеша ({kind}): {result!r}")
+                result_name = "error"
+            else:
+                result_name = "ok"
+            report[kind][result_name] += 1
+            cache_warming_items.labels(kind=kind, result=result_name).inc()
+        return report
+
+
+cache_warmer: CacheWarmer | None = None
+
+
+async def main() -> None:
+    redis = create_redis()
+    elastic = create_elastic()
+    try:
+        await genre_dictionary.load(elastic)
+        await CacheWarmer(redis, elastic).warm()
+    finally:
+        await redis.close()
+        await elastic.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,27 @@
+"""Расчет похожих фильмов для всего каталога.
+
+Запускается по расписанию отдельно от API (python -m src.jobs.similar_films).
+Чтобы API брал списки из кеша, нужно включить SIMILAR_FILMS_PRECOMPUTED.
+"""
+
+import asyncio
+
+from src.db.cache import create_redis
+from src.db.elastic import create_elastic
+from src.services.film import FilmService
+from src.services.genre import GenreService
+
+
+async def main() -> None:
+    redis = create_redis()
+    elastic = create_elastic()
+    try:
+        film_service = FilmService(redis, elastic, GenreService(redis, elastic))
+        await film_service.precompute_similar_films()
+    finally:
+        await redis.close()
+        await elastic.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,25 +1,58 @@
 from contextlib import asynccontextmanager
 
 import uvicorn
-from elasticsearch import AsyncElasticsearch
-from fastapi import FastAPI
+from http import HTTPStatus
+
+from fastapi import FastAPI, Request
 from fastapi.responses import ORJSONResponse
-from redis.asyncio import Redis
 
-from src.api.v1 import films, genres, persons
+from src.api import metrics
+from src.api.v1 import cache as cache_admin, films, genres, persons
 from src.core.config import config
 from src.db import elastic
 from src.db import cache
+from src.db import id_filter
+from src.db import invalidation
+from src.db.genre_dictionary import genre_dictionary
+from src.jobs import cache_warming
+from src.utils.circuit_breaker import CircuitOpenError
+from src.utils.metrics import metrics_middleware
+from src.utils.profiling import profiling_middleware
+from src.utils.staleness import staleness_middleware
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    cache.redis = Redis(host=config.redis_host, port=config.redis_port)
-    elastic.es = AsyncElasticsearch(
-        hosts=[f"http://{config.elastic_host}:{config.elastic_port}"]
+    cache.redis = cache.create_redis()
+    cache.listener_redis = cache.create_redis(listener=True)
+    elastic.es = elastic.create_elastic()
+    await genre_dictionary.load(elastic.es)
+    genre_dictionary.start_refresh(elastic.es)
+    invalidation.cache_invalidator = invalidation.CacheInvalidator(
+        cache.redis, cache.listener_redis
     )
+    invalidation.cache_invalidator.start()
+    if config.id_filter_enabled:
+        id_filter.id_filter = id_filter.IdFilter(
+            cache.redis, elastic.es, cache.listener_redis
+        )
+        id_filter.id_filter.start()
+    if config.cache_warming_enabled:
+        cache_warming.cache_warmer = cache_warming.CacheWarmer(cache.redis, elastic.es)
+        if config.cache_warming_wait_on_startup:
+            await cache_warming.cache_warmer.run()
+            cache_warming.cache_warmer.start(config.cache_warming_interval_in_seconds)
+        else:
+            cache_warming.cache_warmer.start()
     yield
+    if cache_warming.cache_warmer:
+        await cache_warming.cache_warmer.stop()
+    await invalidation.cache_invalidator.stop()
+    if id_filter.id_filter:
+        await id_filter.id_filter.stop()
+    await genre_dictionary.stop_refresh()
     await cache.redis.close()
+    await cache.listener_redis.close()
     await elastic.es.close()
 
 
@@ -31,10 +64,25 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
+app.middleware("http")(staleness_middleware)
+app.middleware("http")(metrics_middleware)
+app.middleware("http")(profiling_middleware)
+
+
+@app.exception_handler(CircuitOpenError)
+async def circuit_open_handler(request: Request, exc: CircuitOpenError):
+    return ORJSONResponse(
+        status_code=HTTPStatus.SERVICE_UNAVAILABLE,
+        content={"detail": "Сервис поиска временно недоступен"},
+        headers={"Retry-After": str(max(int(exc.retry_after), 1))},
+    )
+
 
 app.include_router(films.router, prefix="/api/v1/films", tags=["films"])
 app.include_router(genres.router, prefix="/api/v1/genres", tags=["genres"])
 app.include_router(persons.router, prefix="/api/v1/persons", tags=["persons"])
+app.include_router(cache_admin.router, prefix="/api/v1/cache", tags=["cache"])
+app.include_router(metrics.router)
 
 if __name__ == "__main__":
     uvicorn.run(
@@ -0,0 +1,16 @@
+from typing import Generic, TypeVar
+
+from pydantic import BaseModel, Field
+
+from src.core.config import config
+
+T = TypeVar("T")
+
+
+class BatchRequest(BaseModel):
+    ids: list[str] = Field(..., min_length=1, max_length=config.batch_max_size)
+
+
+class BatchResponse(BaseModel, Generic[T]):
+    items: list[T]
+    not_found: list[str]
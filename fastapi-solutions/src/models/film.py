@@ -5,13 +5,16 @@ from src.models.genre import Genre
 from src.models.person import Person
 
 
-class FilmBase(BaseOrjsonModel):
+class FilmShort(BaseOrjsonModel):
     uuid: str = Field(..., alias="id")
     title: str | None
-    description: str | None
     imdb_rating: float | None
 
 
+class FilmBase(FilmShort):
+    description: str | None
+
+
 class FullFilm(BaseOrjsonModel):
     uuid: str = Field(..., alias="id")
     title: str | None
@@ -21,3 +21,7 @@ class PersonFilmWithRating(BaseOrjsonModel):
     uuid: uuid.UUID
     title: str
     imdb_rating: float
+
+
+class PersonFilmWithRoles(PersonFilmWithRating):
+    roles: list[str]
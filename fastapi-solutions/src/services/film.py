@@ -1,17 +1,25 @@
 import uuid
-from functools import lru_cache
+from functools import lru_cache, partial
 from http import HTTPStatus
 from pydantic import parse_obj_as
 from elasticsearch import AsyncElasticsearch, NotFoundError
 from fastapi import Depends, HTTPException
 from redis.asyncio import Redis
 
+from src.core.config import config
 from src.core.logger import a_api_logger
 from src.db.elastic import get_elastic
 from src.db.cache import get_redis, CacheService
-from src.models.film import FullFilm, Genre, FilmBase
+from src.db.id_filter import might_exist
+from src.db.invalidation import entity_tag
+from src.models.film import FullFilm, Genre, FilmBase, FilmShort
 from src.models.person import Person
 from src.services.genre import GenreService, get_genre_service
+from src.utils.circuit_breaker import CircuitOpenError
+from src.utils.fan_out import fan_out
+from src.utils.pagination import apply_search_after, next_cursor
+from src.utils.projection import source_includes
+from src.utils.query import normalize_query
 
 
 class FilmService:
@@ -30,30 +38,73 @@ class FilmService:
         self.genre_service = genre_service
 
     async def get_film_details(self, film_id: str) -> FullFilm | None:
-        """Получение полной информации по фильму"""
+        """Получение полной информации по фильму. Отсутствие фильма тоже
+        кешируется на cache_negative_expire_in_seconds"""
 
         cache_key = await self.cache.cache_key_generation(film_uuid=film_id)
-        film = await self.cache.get(cache_key)
 
-        if not film:
-            film_data = await self.get_film_from_elastic(film_id)
+        async def build() -> FullFilm | None:
+            if not might_exist(self.index_name, film_id):
+                return None
+            film_data = await self.get_film_from_elastic(
+                film_id, source_includes(FullFilm)
+            )
             if not film_data:
                 return None
-            film = await self.get_full_info(film_data)
+            return await self.get_full_info(film_data)
+
+        return await self.cache.get_or_build(
+            cache_key,
+            FullFilm,
+            build,
+            negative_expire_in_seconds=config.cache_negative_expire_in_seconds,
+            negative_tags=[entity_tag(film_id)],
+        )
 
-            await self.cache.set(cache_key, film)
+    async def get_films_details(self, film_ids: list[str]) -> dict[str, FullFilm]:
+        """Получение полной информации по нескольким фильмам.
 
-            return film
+        Закешированные фильмы берутся одним MGET из Redis, остальные -
+        одним mget из поисковой системы. Ненайденных фильмов нет в результате.
+        """
 
-        film = FullFilm(**film)
+        cache_keys = {
+            film_id: await self.cache.cache_key_generation(film_uuid=film_id)
+            for film_id in film_ids
+        }
+        cached = await self.cache.get_many(list(cache_keys.values()), FullFilm)
+        films = {film_id: film for film_id, film in zip(cache_keys, cached) if film}
 
-        return film
+        missed = [film_id for film_id in cache_keys if film_id not in films]
+        if not missed:
+            return films
+
+        response = await self.elastic.mget(
+            index=self.index_name,
+            ids=missed,
+            source_includes=source_includes(FullFilm),
+        )
+        docs = [doc for doc in response["docs"] if doc.get("found")]
+        built_films = await fan_out(
+            partial(self.get_full_info, doc["_source"]) for doc in docs
+        )
+        built = {}
+        for doc, film in zip(docs, built_films):
+            films[doc["_id"]] = film
+            built[cache_keys[doc["_id"]]] = film
 
-    async def get_film_from_elastic(self, film_id: str) -> dict | None:
-        """Получение фильмов по id фильма"""
+        await self.cache.set_many(built)
+        return films
+
+    async def get_film_from_elastic(
+        self, film_id: str, source: list[str] | None = None
+    ) -> dict | None:
+        """Получение фильмов по id фильма (только полей source, если они переданы)"""
 
         try:
-            doc = await self.elastic.get(index=self.index_name, id=film_id)
+            doc = await self.elastic.get(
+                index=self.index_name, id=film_id, source_includes=source
+            )
             film_data = doc["_source"]
             return film_data
         except NotFoundError as e:
@@ -63,11 +114,14 @@ class FilmService:
     async def get_full_info(self, film_data: dict) -> FullFilm:
         """Преобразование исходных данных фильма"""
 
-        genres_list = []
-        for genre_name in film_data["genres"]:
-            genre_uuid = await self.genre_service.get_uuid_genre(genre_name)
-            genre_obj = Genre(id=genre_uuid, name=genre_name)
-            genres_list.append(genre_obj)
+        genre_uuids = await fan_out(
+            partial(self.genre_service.get_uuid_genre, genre_name)
+            for genre_name in film_data["genres"]
+        )
+        genres_list = [
+            Genre(id=genre_uuid, name=genre_name)
+            for genre_uuid, genre_name in zip(genre_uuids, film_data["genres"])
+        ]
 
         film_data.update(
             {
@@ -87,39 +141,160 @@ class FilmService:
         ]
 
     async def get_similar_films(self, film_id: str) -> list[FilmBase] | None:
-        """Получение списка фильмов, у которых есть хотя бы один такой же жанр,
-        как у переданного фильма (film_id)"""
+        """Получение списка похожих фильмов (film_id): ранжирование по общим
+        жанрам и персонам с учетом рейтинга фильмов.
+
+        Если включен расчет похожих фильмов заранее, список берется из кеша
+        одним запросом, а вычисляется на лету только при его отсутствии.
+        """
+
+        if config.similar_films_precomputed:
+            films = await self.cache.get(
+                await self.similar_films_key(film_id), FilmBase
+            )
+            if films:
+                return films
 
         cache_key = await self.cache.cache_key_generation(
             film_uuid=film_id, similar="similar"
         )
-        cached_film_data = await self.cache.get(cache_key)
 
-        if not cached_film_data:
-            film_data = await self.get_film_from_elastic(film_id)
-            if not film_data:
-                return None
+        async def build() -> list[FilmBase] | None:
+            result = await self.elastic.search(
+                index=self.index_name, body=self.construct_query_for_similar(film_id)
+            )
+            return self.parse_similar_films(result)
 
-            genres = film_data["genres"]
-            query = {
-                "query": {
-                    "bool": {
-                        "should": [{"match": {"genres": genre}} for genre in genres],
-                        "minimum_should_match": 1,
-                    }
-                }
-            }
-            result = await self.elastic.search(index=self.index_name, body=query)
+        return await self.cache.get_or_build(cache_key, FilmBase, build)
 
-            films = [
-                parse_obj_as(FilmBase, hit["_source"]) for hit in result["hits"]["hits"]
-            ]
+    async def similar_films_key(self, film_id: str) -> str:
+        return await self.cache.cache_key_generation(
+            film_uuid=film_id, similar="precomputed"
+        )
 
-            await self.cache.set(cache_key, films)
+    def construct_query_for_similar(self, film_id: str) -> dict:
+        """Создание запроса похожих фильмов.
 
-            return films
+        more_like_this берет термы прямо из документа фильма, поэтому
+        предварительно получать сам фильм не нужно. Совпадение жанров и
+        совпадение персон оцениваются отдельно со своими весами, итоговая
+        оценка умножается на log(1 + imdb_rating).
+        """
 
-        return [FilmBase(**data) for data in cached_film_data]
+        like = [{"_index": self.index_name, "_id": film_id}]
+        return {
+            "query": {
+                "function_score": {
+                    "query": {
+                        "bool": {
+                            "should": [
+                                {
+                                    "more_like_this": {
+                                        "fields": ["genres"],
+                                        "like": like,
+                                        "min_term_freq": 1,
+                                        "min_doc_freq": 1,
+                                        "boost": config.similar_films_genres_boost,
+                                    }
+                                },
+                                {
+                                    "more_like_this": {
+                                        "fields": [
+                                            "actors_names",
+                                            "writers_names",
+                                            "directors_names",
+                                        ],
+                                        "like": like,
+                                        "min_term_freq": 1,
+                                        "min_doc_freq": 1,
+                                        "boost": config.similar_films_people_boost,
+                                    }
+                                },
+                            ],
+                            "minimum_should_match": 1,
+                        }
+                    },
+                    "functions": [
+                        {
+                            "field_value_factor": {
+                                "field": "imdb_rating",
+                                "modifier": "log1p",
+                                "missing": 0,
+                            }
+                        }
+                    ],
+                    "boost_mode": "multiply",
+                }
+            },
+            "size": config.similar_films_size,
+            "_source": source_includes(FilmBase),
+        }
+
+    @staticmethod
+    def parse_similar_films(result: dict) -> list[FilmBase]:
+        return [FilmBase(**hit["_source"]) for hit in result["hits"]["hits"]]
+
+    async def precompute_similar_films(self) -> int:
+        """Расчет списков похожих фильмов для всего каталога.
+
+        Фильмы обходятся страницами через search_after, похожие фильмы для
+        страницы запрашиваются одним msearch и записываются одним конвейером Redis.
+        Возвращает количество сохраненных списков.
+        """
+
+        saved = 0
+        search_after = None
+        while True:
+            query = apply_search_after(
+                {
+                    "query": {"match_all": {}},
+                    "size": config.similar_films_batch_size,
+                    "_source": False,
+                },
+                search_after,
+            )
+            hits = (await self.elastic.search(index=self.index_name, body=query))[
+                "hits"
+            ]["hits"]
+            if not hits:
+                break
+
+            searches = []
+            for hit in hits:
+                searches.append({"index": self.index_name})
+                searches.append(self.construct_query_for_similar(hit["_id"]))
+            response = await self.elastic.msearch(searches=searches)
+
+            similar_films = {}
+            source_tags = {}
+            for hit, result in zip(hits, response["responses"]):
+                if "error" in result:
+                    a_api_logger.error(
+                        f"Ошибка при расчете похожих фильмов для {hit['_id']}: "
+                        f"{result['error']}"
+                    )
+                    continue
+                if films := self.parse_similar_films(result):
+                    key = await self.similar_films_key(hit["_id"])
+                    similar_films[key] = films
+                    source_tags[key] = [entity_tag(hit["_id"])]
+
+            # Список зависит только от исходного фильма и фильмов в нем: тег
+            # списков индекса удалял бы все списки при изменении любого фильма
+            await self.cache.set_many(
+                similar_films,
+                expire_in_seconds=config.similar_films_expire_in_seconds,
+                tags=source_tags,
+                list_tags=False,
+            )
+            saved += len(similar_films)
+
+            if len(hits) < config.similar_films_batch_size:
+                break
+            search_after = hits[-1]["sort"]
+
+        a_api_logger.info(f"Рассчитаны похожие фильмы для {saved} фильмов")
+        return saved
 
     async def get_all_films_from_elastic(
         self,
@@ -127,7 +302,7 @@ class FilmService:
         sort: str = "-imdb_rating",
         page_number: int = 1,
         page_size: int = 10,
-    ) -> list[FilmBase]:
+    ) -> list[FilmShort]:
         """Получение всех фильмов с возможностью фильтрации по uuid жанра.
         По умолчанию остортированы по убыванию imdb_rating"""
 
@@ -137,19 +312,15 @@ class FilmService:
             page_number=page_number,
             page_size=page_size,
         )
-        films = await self.cache.get(cache_key)
 
-        if not films:
+        async def build() -> list[FilmShort]:
             query = await self.construct_query(genre, sort, page_number, page_size)
 
             try:
                 result = await self.elastic.search(index=self.index_name, body=query)
-                films = [FilmBase(**doc["_source"]) for doc in result["hits"]["hits"]]
-
-                if films:
-                    await self.cache.set(cache_key, films)
-
-                return films
+                return [FilmShort(**doc["_source"]) for doc in result["hits"]["hits"]]
+            except CircuitOpenError:
+                raise
             except Exception as e:
                 a_api_logger.error(f"Произошла непредвиденная ошибка:{e}")
                 raise HTTPException(
@@ -157,7 +328,7 @@ class FilmService:
                     detail=f"Произошла непредвиденная ошибка {e}",
                 )
 
-        return [FilmBase(**data) for data in films]
+        return await self.cache.get_or_build(cache_key, FilmShort, build)
 
     async def construct_query(
         self,
@@ -176,24 +347,75 @@ class FilmService:
             "sort": [{sort_field: {"order": sort_direction}}],
             "from": (page_number - 1) * page_size,
             "size": page_size,
+            "_source": source_includes(FilmShort),
         }
         genre_name = await self.genre_service.get_genre_name(genre)
         if genre_name:
             query["query"] = {"terms": {"genres": [str(genre_name)]}}
         return query
 
+    async def get_films_by_cursor(
+        self,
+        genre: uuid.UUID = None,
+        sort: str = "-imdb_rating",
+        search_after: list | None = None,
+        page_size: int = 10,
+    ) -> tuple[list[FilmShort], str | None]:
+        """Получение страницы фильмов по курсору и курсора следующей страницы"""
+
+        query = await self.construct_query(genre, sort, page_size=page_size)
+        apply_search_after(query, search_after)
+        result = await self.elastic.search(index=self.index_name, body=query)
+
+        hits = result["hits"]["hits"]
+        return [FilmShort(**hit["_source"]) for hit in hits], next_cursor(
+            hits, page_size
+        )
+
     async def search_film(
         self, search: str, page_number: int, page_size: int
-    ) -> list[FilmBase] | None:
-        """Поиск фильмов"""
+    ) -> list[FilmShort] | None:
+        """Поиск фильмов. Результаты кешируются по нормализованному запросу,
+        пустые - на более короткий срок"""
 
-        query = await self.construct_query_for_search(search, page_number, page_size)
+        search = normalize_query(search)
+        cache_key = await self.cache.cache_key_generation(
+            search=search, page_number=page_number, page_size=page_size
+        )
+
+        async def build() -> list[FilmShort]:
+            query = await self.construct_query_for_search(
+                search, page_number, page_size
+            )
+            result = await self.elastic.search(index=self.index_name, body=query)
+            return [
+                parse_obj_as(FilmShort, hit["_source"])
+                for hit in result["hits"]["hits"]
+            ]
+
+        return await self.cache.get_or_build(
+            cache_key,
+            FilmShort,
+            build,
+            expire_in_seconds=config.cache_search_expire_in_seconds,
+            negative_expire_in_seconds=config.cache_search_empty_expire_in_seconds,
+        )
+
+    async def search_film_by_cursor(
+        self, search: str, search_after: list | None, page_size: int
+    ) -> tuple[list[FilmShort], str | None]:
+        """Поиск фильмов по курсору"""
+
+        query = await self.construct_query_for_search(
+            normalize_query(search), 1, page_size
+        )
+        apply_search_after(query, search_after, [{"_score": "desc"}])
         result = await self.elastic.search(index=self.index_name, body=query)
 
-        film = [
-            parse_obj_as(FilmBase, hit["_source"]) for hit in result["hits"]["hits"]
-        ]
-        return film
+        hits = result["hits"]["hits"]
+        return [FilmShort(**hit["_source"]) for hit in hits], next_cursor(
+            hits, page_size
+        )
 
     @staticmethod
     async def construct_query_for_search(
@@ -211,6 +433,7 @@ class FilmService:
             },
             "from": (page_number - 1) * page_size,
             "size": page_size,
+            "_source": source_includes(FilmShort),
         }
         return query
 
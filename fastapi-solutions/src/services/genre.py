@@ -1,5 +1,5 @@
 import uuid
-from functools import lru_cache
+from functools import lru_cache, partial
 from http import HTTPStatus
 
 from elastic_transport import ObjectApiResponse
@@ -7,10 +7,17 @@ from elasticsearch import AsyncElasticsearch, NotFoundError
 from fastapi import Depends, HTTPException
 from redis.asyncio import Redis
 
+from src.core.config import config
 from src.core.logger import a_api_logger
 from src.db.elastic import get_elastic
 from src.db.cache import get_redis, CacheService
+from src.db.genre_dictionary import genre_dictionary
+from src.db.id_filter import might_exist
+from src.db.invalidation import entity_tag
 from src.models.genre import Genre
+from src.utils.circuit_breaker import CircuitOpenError
+from src.utils.pagination import apply_search_after, next_cursor
+from src.utils.projection import source_includes
 
 
 class GenreService:
@@ -24,37 +31,82 @@ class GenreService:
         self.elastic = elastic
 
     async def get_genre(self, genre_uuid: str) -> Genre | None:
-        """Получение информации по конкретному жанру по его uuid"""
+        """Получение информации по конкретному жанру по его uuid.
+        Отсутствие жанра тоже кешируется на cache_negative_expire_in_seconds"""
 
         cache_key = await self.cache.cache_key_generation(genre_uuid=genre_uuid)
-        genre = await self.cache.get(cache_key)
 
-        if not genre:
-            try:
-                response_from_es = await self.elastic.get(
-                    index=self.index_name, id=genre_uuid
-                )
-            except NotFoundError as nf_err:
-                a_api_logger.error(
-                    f"Жанр (uuid: {genre_uuid}) не найден, ошибка: {nf_err}"
-                )
-                return None
-            except Exception as gen_exc:
-                a_api_logger.error(
-                    f"Ошибка в процессе поиска жанра (uuid: {genre_uuid}): {gen_exc}"
-                )
+        async def build() -> Genre | None:
+            if not might_exist(self.index_name, genre_uuid):
                 return None
+            return await self.get_genre_from_elastic(genre_uuid)
+
+        return await self.cache.get_or_build(
+            cache_key,
+            Genre,
+            build,
+            negative_expire_in_seconds=config.cache_negative_expire_in_seconds,
+            negative_tags=[entity_tag(genre_uuid)],
+        )
 
-            genre = response_from_es["_source"]
-            if not genre:
-                a_api_logger.info(f"Жанр (uuid: {genre_uuid}) не найден")
-                return None
+    async def get_genres_by_ids(self, genre_uuids: list[str]) -> dict[str, Genre]:
+        """Получение нескольких жанров: из кеша одним MGET, остальных -
+        одним mget из поисковой системы"""
+
+        cache_keys = {
+            genre_uuid: await self.cache.cache_key_generation(genre_uuid=genre_uuid)
+            for genre_uuid in genre_uuids
+        }
+        cached = await self.cache.get_many(list(cache_keys.values()), Genre)
+        genres = {
+            genre_uuid: genre for genre_uuid, genre in zip(cache_keys, cached) if genre
+        }
+
+        missed = [genre_uuid for genre_uuid in cache_keys if genre_uuid not in genres]
+        if not missed:
+            return genres
 
-            genre = Genre(**genre)
+        response = await self.elastic.mget(
+            index=self.index_name, ids=missed, source_includes=source_includes(Genre)
+        )
+        built = {}
+        for doc in response["docs"]:
+            if not doc.get("found"):
+                continue
+            genres[doc["_id"]] = Genre(**doc["_source"])
+            built[cache_keys[doc["_id"]]] = genres[doc["_id"]]
+
+        await self.cache.set_many(built)
+        return genres
+
+    async def get_genre_from_elastic(self, genre_uuid: str) -> Genre | None:
+        """Получение жанра по его uuid из поисковой системы"""
+
+        try:
+            response_from_es = await self.elastic.get(
+                index=self.index_name,
+                id=genre_uuid,
+                source_includes=source_includes(Genre),
+            )
+        except NotFoundError as nf_err:
+            a_api_logger.error(f"Жанр (uuid: {genre_uuid}) не найден, ошибка: {nf_err}")
+            return None
+        except CircuitOpenError:
+            raise
+        except Exception as gen_exc:
+            # Ошибка поиска не означает, что жанра нет: такой результат
+            # не должен попасть в кеш как отсутствующий жанр
+            a_api_logger.error(
+                f"Ошибка в процессе поиска жанра (uuid: {genre_uuid}): {gen_exc}"
+            )
+            raise
 
-            await self.cache.set(cache_key, genre)
+        genre = response_from_es["_source"]
+        if not genre:
+            a_api_logger.info(f"Жанр (uuid: {genre_uuid}) не найден")
+            return None
 
-        return genre
+        return Genre(**genre)
 
     async def get_genres(self, page_number: int, page_size: int) -> list[Genre] | None:
         """Получение списка жанров из поисковой системы или кеша"""
@@ -63,29 +115,32 @@ class GenreService:
             page_number=page_number,
             page_size=page_size,
         )
-        genres = await self.cache.get(cache_key)
-
-        if not genres:
-            genres = await self.get_all_genres_from_elastic(
-                page_size=page_size, page_number=page_number
-            )
-
-            if not genres:
-                return None
-
-            await self.cache.set(cache_key, genres)
 
-        return genres
+        return await self.cache.get_or_build(
+            cache_key,
+            Genre,
+            partial(
+                self.get_all_genres_from_elastic,
+                page_size=page_size,
+                page_number=page_number,
+            ),
+        )
 
     async def get_genre_name(self, genre: uuid.UUID = None) -> str | None:
         """Получение названия жанра по переданному uuid жанра"""
 
         if genre:
+            genre_name = genre_dictionary.get_name(str(genre))
+            if genre_name:
+                return genre_name
+
             try:
                 genre_result = await self.elastic.get(
-                    index=self.index_name, id=str(genre)
+                    index=self.index_name, id=str(genre), source_includes=["name"]
                 )
-                return genre_result["_source"]["name"]
+                genre_name = genre_result["_source"]["name"]
+                genre_dictionary.add(str(genre), genre_name)
+                return genre_name
             except NotFoundError as e:
                 a_api_logger.error(f"Жанр не найден: {e}")
                 raise HTTPException(
@@ -97,11 +152,16 @@ class GenreService:
     async def get_uuid_genre(self, genre_name: str) -> uuid.UUID:
         """Получение uuid жанра по переданному названию жанра"""
 
-        query = {"query": {"match": {"name": genre_name}}}
+        genre_uuid = genre_dictionary.get_uuid(genre_name)
+        if genre_uuid:
+            return genre_uuid
+
+        query = {"query": {"match": {"name": genre_name}}, "_source": ["id", "name"]}
         try:
             response = await self.elastic.search(index=self.index_name, body=query)
             if response["hits"]["total"]["value"] > 0:
                 genre_data = response["hits"]["hits"][0]["_source"]
+                genre_dictionary.add(genre_data["id"], genre_data["name"])
                 return genre_data["id"]
             else:
                 raise NotFoundError(f"Жанр '{genre_name}' не найден")
@@ -124,6 +184,8 @@ class GenreService:
         except NotFoundError as nf_err:
             a_api_logger.error(f"Жанры не найдены, ошибка: {nf_err}")
             return None
+        except CircuitOpenError:
+            raise
         except Exception as gen_exc:
             a_api_logger.error(f"Ошибка в процессе поиска жанров: {gen_exc}")
             return None
@@ -132,6 +194,18 @@ class GenreService:
 
         return genres
 
+    async def get_genres_by_cursor(
+        self, search_after: list | None, page_size: int
+    ) -> tuple[list[Genre], str | None]:
+        """Получение страницы жанров по курсору и курсора следующей страницы"""
+
+        query = await self.construct_query_for_genres_list(page_size, 1)
+        apply_search_after(query, search_after, [])
+        es_response = await self.elastic.search(index=self.index_name, body=query)
+
+        hits = es_response["hits"]["hits"]
+        return [Genre(**hit["_source"]) for hit in hits], next_cursor(hits, page_size)
+
     async def construct_query_for_genres_list(
         self, page_size: int, page_number: int
     ) -> dict:
@@ -141,6 +215,7 @@ class GenreService:
             "query": {"match_all": {}},
             "from": (page_number - 1) * page_size,
             "size": page_size,
+            "_source": source_includes(Genre),
         }
 
         return query
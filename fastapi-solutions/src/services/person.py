@@ -1,16 +1,35 @@
 import uuid
-from functools import lru_cache
-from typing import Optional
+from functools import lru_cache, partial
+from typing import AsyncIterator, Optional
 
 from fastapi import Depends
 
 from elasticsearch import AsyncElasticsearch, NotFoundError
 from redis.asyncio import Redis
 
+from src.core.config import config
 from src.core.logger import a_api_logger
 from src.db.elastic import get_elastic
 from src.db.cache import get_redis, CacheService
-from src.models.person import PersonWithFilms, PersonFilm, PersonFilmWithRating
+from src.db.id_filter import might_exist
+from src.db.invalidation import entity_tag
+from src.models.person import (
+    Person,
+    PersonWithFilms,
+    PersonFilm,
+    PersonFilmWithRating,
+    PersonFilmWithRoles,
+)
+from src.utils.fan_out import fan_out
+from src.utils.pagination import apply_search_after, next_cursor, paginate_stream
+from src.utils.projection import source_includes
+from src.utils.query import normalize_query
+
+ROLES = {
+    "directors_names": "director",
+    "actors_names": "actor",
+    "writers_names": "writer",
+}
 
 
 class PersonService:
@@ -18,45 +37,127 @@ class PersonService:
         self, cache: Redis, elastic: AsyncElasticsearch, index_name: str = "persons"
     ):
         self.index_name = index_name
-        self.cache = CacheService(cache, self.index_name)
+        # Фильмографии персон меняются вместе с составом фильмов
+        self.cache = CacheService(cache, self.index_name, dependencies=["movies"])
         self.elastic = elastic
 
     async def get_by_id(self, person_id: str) -> Optional[PersonWithFilms]:
         cache_key = await self.cache.cache_key_generation(person_uuid=person_id)
-        person = await self.cache.get(cache_key)
 
-        if not person:
-            person = await self._get_person_from_elastic(person_id)
-            if not person:
-                a_api_logger.info("Not found person")
+        async def build() -> PersonWithFilms | None:
+            if not might_exist(self.index_name, person_id):
                 return None
+            return await self._get_person_from_elastic(person_id)
 
-            await self.cache.set(cache_key, person)
+        person = await self.cache.get_or_build(
+            cache_key,
+            PersonWithFilms,
+            build,
+            negative_expire_in_seconds=config.cache_negative_expire_in_seconds,
+            negative_tags=[entity_tag(person_id)],
+        )
+        if not person:
+            a_api_logger.info("Not found person")
+            return None
 
         return person
 
+    async def get_by_ids(self, person_ids: list[str]) -> dict[str, PersonWithFilms]:
+        """Получение нескольких персон: закешированные берутся одним MGET,
+        остальные - одним mget и одним multi-search запросом за их фильмами"""
+
+        cache_keys = {
+            person_id: await self.cache.cache_key_generation(person_uuid=person_id)
+            for person_id in person_ids
+        }
+        cached = await self.cache.get_many(list(cache_keys.values()), PersonWithFilms)
+        persons = {
+            person_id: person for person_id, person in zip(cache_keys, cached) if person
+        }
+
+        missed = [person_id for person_id in cache_keys if person_id not in persons]
+        if not missed:
+            return persons
+
+        response = await self.elastic.mget(
+            index=self.index_name,
+            ids=missed,
+            source_includes=source_includes(Person),
+        )
+        found = [doc["_source"] for doc in response["docs"] if doc.get("found")]
+        films_for_persons = await self._get_films_for_persons_batch(
+            [person["full_name"] for person in found]
+        )
+
+        built = {}
+        for person, films in zip(found, films_for_persons):
+            persons[person["id"]] = PersonWithFilms(
+                uuid=person["id"],
+                full_name=person["full_name"],
+                films=[PersonFilm(uuid=film.uuid, roles=film.roles) for film in films],
+            )
+            built[cache_keys[person["id"]]] = persons[person["id"]]
+
+        await self.cache.set_many(built)
+        return persons
+
     async def search_for_a_person(
         self, query: str, page_number: int = 1, page_size: int = 10
-    ):
+    ) -> list[PersonWithFilms] | None:
+        """Поиск персон. Результаты кешируются по нормализованному запросу,
+        пустые - на более короткий срок"""
+
+        query = normalize_query(query)
+        cache_key = await self.cache.cache_key_generation(
+            search=query, page_number=page_number, page_size=page_size
+        )
+
+        async def build() -> list[PersonWithFilms]:
+            body = await self._construct_query(query, page_number, page_size)
+            doc = await self.elastic.search(index="persons", body=body)
+            return await self._get_persons_with_films(doc["hits"]["hits"])
+
         try:
-            query = await self._construct_query(query, page_number, page_size)
-            doc = await self.elastic.search(index="persons", body=query)
-            persons_list = []
-            for hit in doc["hits"]["hits"]:
-                films = await self._get_films_for_persons(hit["_source"]["full_name"])
-                person_films = [
-                    PersonFilm(uuid=film[0], roles=film[1]["roles"])
-                    for film in films.items()
-                ]
-                persons_list.append(
-                    PersonWithFilms(
-                        uuid=hit["_source"]["id"],
-                        full_name=hit["_source"]["full_name"],
-                        films=person_films,
-                    ).dict()
-                )
+            return await self.cache.get_or_build(
+                cache_key,
+                PersonWithFilms,
+                build,
+                expire_in_seconds=config.cache_search_expire_in_seconds,
+                negative_expire_in_seconds=config.cache_search_empty_expire_in_seconds,
+            )
         except NotFoundError:
             return None
+
+    async def search_persons_by_cursor(
+        self, query: str, search_after: list | None, page_size: int
+    ) -> tuple[list[PersonWithFilms], str | None]:
+        """Поиск персон по курсору и курсор следующей страницы"""
+
+        query = await self._construct_query(normalize_query(query), 1, page_size)
+        apply_search_after(query, search_after, [{"_score": "desc"}])
+        doc = await self.elastic.search(index="persons", body=query)
+
+        hits = doc["hits"]["hits"]
+        persons_list = await self._get_persons_with_films(hits)
+        return persons_list, next_cursor(hits, page_size)
+
+    async def _get_persons_with_films(self, hits: list[dict]) -> list[PersonWithFilms]:
+        persons = [hit["_source"] for hit in hits]
+        films_for_persons = await self._get_films_for_persons_batch(
+            [person["full_name"] for person in persons]
+        )
+        persons_list = []
+        for person, films in zip(persons, films_for_persons):
+            person_films = [
+                PersonFilm(uuid=film.uuid, roles=film.roles) for film in films
+            ]
+            persons_list.append(
+                PersonWithFilms(
+                    uuid=person["id"],
+                    full_name=person["full_name"],
+                    films=person_films,
+                )
+            )
         return persons_list
 
     async def _construct_query(
@@ -70,44 +171,61 @@ class PersonService:
             "query": {"match": {"full_name": {"query": query, "fuzziness": "auto"}}},
             "from": (page_number - 1) * page_size,
             "size": page_size,
+            "_source": source_includes(Person),
         }
         return query
 
-    async def get_only_person_films(self, person_id: uuid) -> PersonWithFilms | None:
+    async def get_only_person_films(
+        self, person_id: uuid, page_number: int = 1, page_size: int = 10
+    ) -> list[PersonFilmWithRating] | None:
         cache_key = await self.cache.cache_key_generation(
-            person_uuid=person_id, movie="movie"
+            person_uuid=person_id,
+            movie="movie",
+            page_number=page_number,
+            page_size=page_size,
+        )
+
+        return await self.cache.get_or_build(
+            cache_key,
+            PersonFilmWithRating,
+            partial(
+                self._get_person_films_from_elastic, person_id, page_number, page_size
+            ),
         )
-        person_films = await self.cache.get(cache_key)
-
-        if not person_films:
-            try:
-                doc = await self.elastic.get(index="persons", id=person_id)
-                result = doc["_source"]
-                films = await self._get_films_for_persons(result["full_name"])
-                person_films = [
-                    PersonFilmWithRating(
-                        uuid=film[0],
-                        title=film[1]["title"],
-                        imdb_rating=film[1]["imdb_rating"],
-                    )
-                    for film in films.items()
-                ]
-            except NotFoundError:
-                a_api_logger.error("Failed to get person films from elastic!")
-                return None
 
-            await self.cache.set(cache_key, person_films)
+    async def _get_person_films_from_elastic(
+        self, person_id: uuid, page_number: int, page_size: int
+    ) -> list[PersonFilmWithRating] | None:
+        try:
+            doc = await self.elastic.get(
+                index="persons", id=person_id, source_includes=source_includes(Person)
+            )
+            result = doc["_source"]
+            films = await paginate_stream(
+                self._iter_person_films(result["full_name"]),
+                page_number,
+                page_size,
+            )
+        except NotFoundError:
+            a_api_logger.error("Failed to get person films from elastic!")
+            return None
 
-        return person_films
+        return [
+            PersonFilmWithRating(
+                uuid=film.uuid, title=film.title, imdb_rating=film.imdb_rating
+            )
+            for film in films
+        ]
 
     async def _get_person_from_elastic(self, person_id: uuid) -> PersonWithFilms | None:
         try:
-            doc = await self.elastic.get(index="persons", id=person_id)
+            doc = await self.elastic.get(
+                index="persons", id=person_id, source_includes=source_includes(Person)
+            )
             result = doc["_source"]
-            films = await self._get_films_for_persons(result["full_name"])
             person_films = [
-                PersonFilm(uuid=film[0], roles=film[1]["roles"])
-                for film in films.items()
+                PersonFilm(uuid=film.uuid, roles=film.roles)
+                async for film in self._iter_person_films(result["full_name"])
             ]
         except NotFoundError:
             a_api_logger.error("Failed to get person from elastic!")
@@ -116,37 +234,143 @@ class PersonService:
             uuid=result["id"], full_name=result["full_name"], films=person_films
         )
 
-    async def _get_films_for_persons(self, person_name: str) -> dict | None:
-        ROLES = {
-            "directors_names": "director",
-            "actors_names": "actor",
-            "writers_names": "writer",
-        }
+    async def _iter_person_films(
+        self, person_name: str, search_after: list | None = None
+    ) -> AsyncIterator[PersonFilmWithRoles]:
+        """Потоковое получение всей фильмографии персоны (после search_after,
+        если он передан).
+
+        Фильмы запрашиваются страницами по person_films_size через search_after,
+        поэтому в памяти одновременно находится не больше одной страницы.
+        """
+
+        query = apply_search_after(
+            self._construct_query_for_person_films(person_name), search_after
+        )
+
+        while True:
+            result = await self.elastic.search(index="movies", body=query)
+            hits = result["hits"]["hits"]
+            for film in self._parse_person_films(result):
+                yield film
+
+            if len(hits) < query["size"]:
+                return
+            query["search_after"] = hits[-1]["sort"]
+
+    async def _get_films_for_persons_batch(
+        self, person_names: list[str]
+    ) -> list[list[PersonFilmWithRoles]]:
+        """Получение фильмов с ролями сразу для нескольких персон.
+
+        Закешированные фильмы всех персон берутся из кеша одним MGET, для
+        остальных выполняется один multi-search запрос, роли внутри каждого
+        фильма определяются по именованным запросам (matched_queries).
+        Фильмография, не поместившаяся в страницу multi-search запроса,
+        дочитывается через search_after.
+        """
+
+        if not person_names:
+            return []
+
+        cache_keys = [
+            await self.cache.cache_key_generation(
+                person_name=person_name, roles="roles"
+            )
+            for person_name in person_names
+        ]
+        films_for_persons = await self.cache.get_many(cache_keys, PersonFilmWithRoles)
+        missed = [
+            position
+            for position, films in enumerate(films_for_persons)
+            if films is None
+        ]
+        if not missed:
+            return films_for_persons
+
+        searches = []
+        for position in missed:
+            searches.append({"index": "movies"})
+            searches.append(
+                apply_search_after(
+                    self._construct_query_for_person_films(person_names[position]),
+                    None,
+                )
+            )
+
         try:
-            films = {}
-            for role in ROLES.keys():
-                query = {
-                    "query": {
-                        "bool": {
-                            "should": [{"match": {role: person_name}}],
-                            "minimum_should_match": 1,
-                        }
-                    }
-                }
-                result = await self.elastic.search(index="movies", body=query)
-                if result:
-                    for film in result["hits"]["hits"]:
-                        film = film["_source"]
-                        if film["id"] not in films:
-                            films[film["id"]] = {}
-                            films[film["id"]]["roles"] = [ROLES[role]]
-                            films[film["id"]]["title"] = film["title"]
-                            films[film["id"]]["imdb_rating"] = film["imdb_rating"]
-                        else:
-                            films[film["id"]]["roles"].append(ROLES[role])
-            return films
+            response = await self.elastic.msearch(searches=searches)
         except NotFoundError:
-            return None
+            return [films or [] for films in films_for_persons]
+
+        found = {}
+        incomplete = []
+        for position, result in zip(missed, response["responses"]):
+            if "error" in result:
+                a_api_logger.error(
+                    f"Failed to get films for person {person_names[position]}: "
+                    f"{result['error']}"
+                )
+                films_for_persons[position] = []
+                continue
+            films_for_persons[position] = self._parse_person_films(result)
+            found[cache_keys[position]] = films_for_persons[position]
+            hits = result["hits"]["hits"]
+            if len(hits) >= config.person_films_size:
+                incomplete.append((position, hits[-1]["sort"]))
+
+        async def rest_of_films(
+            person_name: str, search_after: list
+        ) -> list[PersonFilmWithRoles]:
+            return [
+                film
+                async for film in self._iter_person_films(person_name, search_after)
+            ]
+
+        rest = await fan_out(
+            partial(rest_of_films, person_names[position], search_after)
+            for position, search_after in incomplete
+        )
+        for (position, _), films in zip(incomplete, rest):
+            films_for_persons[position].extend(films)
+
+        await self.cache.set_many(found, model=PersonFilmWithRoles)
+
+        return films_for_persons
+
+    @staticmethod
+    def _construct_query_for_person_films(person_name: str) -> dict:
+        """Создание запроса на поиск фильмов персоны сразу по всем ролям"""
+
+        return {
+            "query": {
+                "bool": {
+                    "should": [
+                        {"match": {field: {"query": person_name, "_name": role}}}
+                        for field, role in ROLES.items()
+                    ],
+                    "minimum_should_match": 1,
+                }
+            },
+            "size": config.person_films_size,
+            "_source": source_includes(PersonFilmWithRating),
+        }
+
+    @staticmethod
+    def _parse_person_films(result: dict) -> list[PersonFilmWithRoles]:
+        films = []
+        for hit in result["hits"]["hits"]:
+            film = hit["_source"]
+            matched_roles = hit.get("matched_queries", [])
+            films.append(
+                PersonFilmWithRoles(
+                    uuid=film["id"],
+                    title=film["title"],
+                    imdb_rating=film["imdb_rating"],
+                    roles=[role for role in ROLES.values() if role in matched_roles],
+                )
+            )
+        return films
 
 
 @lru_cache()
@@ -0,0 +1,109 @@
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable
+
+from src.core.logger import a_api_logger
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Обращение к сервису не выполнялось, так как предохранитель разомкнут"""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} временно недоступен")
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """Предохранитель для обращений к внешнему сервису.
+
+    Хранит исходы последних window_size вызовов. Если среди них доля неудачных
+    (ошибок и вызовов дольше slow_call_in_seconds) достигла failure_rate,
+    предохранитель размыкается, и вызовы сразу завершаются CircuitOpenError,
+    не дожидаясь таймаутов. Через open_in_seconds пропускается один пробный
+    вызов: при успехе предохранитель замыкается, при неудаче снова размыкается.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        is_failure: Callable[[Exception], bool],
+        window_size: int,
+        min_calls: int,
+        failure_rate: float,
+        slow_call_in_seconds: float,
+        open_in_seconds: float,
+    ):
+        self.name = name
+        self.is_failure = is_failure
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_in_seconds = slow_call_in_seconds
+        self.open_in_seconds = open_in_seconds
+        self.state = CLOSED
+        self._outcomes: deque[bool] = deque(maxlen=window_size)
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+    async def call(self, func: Callable[[], Awaitable[Any]]) -> Any:
+        probe = self._before_call()
+        started_at = time.monotonic()
+        try:
+            result = await func()
+        except Exception as exc:
+            if self.is_failure(exc):
+                self._record(False, probe)
+            else:
+                self._record(True, probe)
+            raise
+        except BaseException:
+            # Отмена вызывающей корутины ничего не говорит о состоянии сервиса
+            if probe:
+                self._probe_in_flight = False
+            raise
+
+        self._record(time.monotonic() - started_at < self.slow_call_in_seconds, probe)
+        return result
+
+    def _before_call(self) -> bool:
+        if self.state == CLOSED:
+            return False
+
+        retry_after = self._opened_at + self.open_in_seconds - time.monotonic()
+        if retry_after > 0 or self._probe_in_flight:
+            raise CircuitOpenError(self.name, max(retry_after, 0.0))
+
+        self.state = HALF_OPEN
+        self._probe_in_flight = True
+        return True
+
+    def _record(self, success: bool, probe: bool) -> None:
+        if probe:
+            self._probe_in_flight = False
+            if success:
+                self._close()
+            else:
+                self._open()
+            return
+
+        if self.state != CLOSED:
+            return
+
+        self._outcomes.append(success)
+        if len(self._outcomes) < self.min_calls:
+            return
+        failures = self._outcomes.count(False)
+        if failures / len(self._outcomes) >= self.failure_rate:
+            self._open()
+
+    def _open(self) -> None:
+        a_api_logger.error(f"Предохранитель {self.name} разомкнут")
+        self.state = OPEN
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
+
+    def _close(self) -> None:
+        a_api_logger.info(f"Предохранитель {self.name} замкнут")
+        self.state = CLOSED
+        self._outcomes.clear()
@@ -0,0 +1,55 @@
+import asyncio
+from contextlib import nullcontext
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Iterable, TypeVar
+
+from src.core.config import config
+
+T = TypeVar("T")
+
+# Общее для процесса ограничение числа одновременных вызовов
+_semaphore = asyncio.Semaphore(config.fan_out_concurrency)
+_inside_fan_out: ContextVar[bool] = ContextVar("inside_fan_out", default=False)
+
+
+async def fan_out(
+    calls: Iterable[Callable[[], Awaitable[T]]],
+    limit: int | None = None,
+    timeout: float | None = None,
+    return_exceptions: bool = False,
+) -> list[T | BaseException]:
+    """Параллельное выполнение независимых обращений к внешним сервисам.
+
+    Вызовы всех fan_out процесса делят общий лимит fan_out_concurrency,
+    limit дополнительно ограничивает вызовы одного fan_out. Вложенный fan_out
+    выполняется в счет места родительского вызова и ограничен только своим
+    лимитом, иначе родители могли бы занять все места и ждать вложенные
+    вызовы бесконечно. Каждый вызов ограничен по времени timeout.
+
+    Результаты возвращаются в порядке вызовов. При ошибке одного из вызовов
+    или отмене ожидающей корутины остальные вызовы отменяются.
+    С return_exceptions ошибки вызовов (в том числе таймауты) возвращаются
+    на месте их результатов, а остальные вызовы продолжаются.
+    """
+
+    nested = _inside_fan_out.get()
+    shared = nullcontext() if nested else _semaphore
+    if limit or nested:
+        local = asyncio.Semaphore(limit or config.fan_out_concurrency)
+    else:
+        local = nullcontext()
+    timeout = timeout or config.fan_out_timeout_in_seconds
+
+    async def run(call: Callable[[], Awaitable[T]]) -> T:
+        async with local, shared:
+            _inside_fan_out.set(True)
+            return await asyncio.wait_for(call(), timeout)
+
+    tasks = [asyncio.ensure_future(run(call)) for call in calls]
+    try:
+        return await asyncio.gather(*tasks, return_exceptions=return_exceptions)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
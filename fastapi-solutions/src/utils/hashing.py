@@ -0,0 +1,11 @@
+import hashlib
+
+
+def hash_positions(item: str, count: int, size: int) -> list[int]:
+    """count позиций строки в диапазоне [0, size), одинаковых во всех процессах"""
+
+    # Две половины одного хеша дают count независимых позиций
+    digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+    first = int.from_bytes(digest[:8], "big")
+    second = int.from_bytes(digest[8:], "big") | 1
+    return [(first + number * second) % size for number in range(count)]
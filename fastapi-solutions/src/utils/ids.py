@@ -0,0 +1,11 @@
+import re
+
+UUID_PATTERN = re.compile(
+    r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}"
+)
+
+
+def is_uuid(value: str) -> bool:
+    """Проверка, что строка - uuid в каноническом виде (в нижнем регистре)"""
+
+    return UUID_PATTERN.fullmatch(value) is not None
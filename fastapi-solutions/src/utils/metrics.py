@@ -0,0 +1,161 @@
+"""Метрики приложения в текстовом формате Prometheus.
+
+Метрики ведутся через prometheus_client. Если задана переменная окружения
+PROMETHEUS_MULTIPROC_DIR (ее задает gunicorn.conf.py), значения воркеров
+gunicorn пишутся в файлы общего каталога, и /metrics любого воркера отдает
+их сумму по всем процессам.
+"""
+
+import os
+import time
+from typing import Callable
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+from src.core.logger import a_api_logger
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Значения показателей с функцией обновляются при запросах не чаще
+CALLBACK_GAUGES_UPDATE_INTERVAL_IN_SECONDS = 1.0
+
+callback_gauges: list["CallbackGauge"] = []
+_callback_gauges_updated_at = 0.0
+
+
+class CallbackGauge:
+    """Показатель, значения которого вычисляются функцией collect.
+
+    prometheus_client не поддерживает такие показатели в режиме нескольких
+    процессов, поэтому значения процесса записываются в обычный Gauge: перед
+    отдачей метрик и при обработке запросов (update_callback_gauges).
+    multiprocess_mode задает, как объединяются значения воркеров.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple,
+        collect: Callable[[], dict[tuple, float]],
+        multiprocess_mode: str = "livesum",
+    ):
+        self.gauge = Gauge(
+            name, documentation, labelnames, multiprocess_mode=multiprocess_mode
+        )
+        self.collect = collect
+        callback_gauges.append(self)
+
+    def update(self) -> None:
+        for key, value in self.collect().items():
+            (self.gauge.labels(*key) if key else self.gauge).set(value)
+
+
+def update_callback_gauges(force: bool = False) -> None:
+    global _callback_gauges_updated_at
+
+    now = time.monotonic()
+    if (
+        not force
+        and now - _callback_gauges_updated_at
+        < CALLBACK_GAUGES_UPDATE_INTERVAL_IN_SECONDS
+    ):
+        return
+    _callback_gauges_updated_at = now
+    for gauge in callback_gauges:
+        # Ошибка расчета показателя не должна ломать обработку запроса
+        try:
+            gauge.update()
+        except Exception as exc:
+            a_api_logger.error(f"Ошибка при расчете метрики {gauge.gauge._name}: {exc}")
+
+
+def render() -> bytes:
+    update_callback_gauges(force=True)
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        return generate_latest(REGISTRY)
+
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry)
+
+
+http_request_duration = Histogram(
+    "http_request_duration_seconds",
+    "Длительность обработки HTTP-запроса",
+    ("method", "route", "status"),
+    buckets=DEFAULT_BUCKETS,
+)
+
+cache_requests = Counter(
+    "cache_requests_total",
+    "Обращения к кешу по индексу, уровню кеша и результату",
+    ("index", "layer", "result"),
+)
+
+cache_serialization_duration = Histogram(
+    "cache_serialization_seconds",
+    "Длительность кодирования и декодирования значений кеша",
+    ("index", "operation"),
+    buckets=(0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1),
+)
+
+response_serialization_duration = Histogram(
+    "response_serialization_seconds",
+    "Длительность валидации и сериализации тела ответа",
+    ("model",),
+    buckets=(0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1),
+)
+
+elastic_request_duration = Histogram(
+    "elasticsearch_request_duration_seconds",
+    "Длительность запроса к Elasticsearch по типу запроса и методу сервиса",
+    ("operation", "caller", "outcome"),
+    buckets=DEFAULT_BUCKETS,
+)
+
+cache_warming_items = Counter(
+    "cache_warming_items_total",
+    "Значения, прогретые в кеше, по типу значения и результату",
+    ("kind", "result"),
+)
+
+id_filter_lookups = Counter(
+    "id_filter_lookups_total",
+    "Проверки id по фильтру известных id: пропущенные дальше и отсеченные",
+    ("index", "result"),
+)
+
+cache_warming_duration = Histogram(
+    "cache_warming_duration_seconds",
+    "Длительность прогрева кеша",
+    buckets=(1.0, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0),
+)
+
+
+async def metrics_middleware(request, call_next):
+    """Измерение длительности обработки запроса по шаблону пути маршрута"""
+
+    started_at = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        http_request_duration.labels(
+            method=request.method,
+            route=route.path if route else "unmatched",
+            status=status,
+        ).observe(time.perf_counter() - started_at)
+        update_callback_gauges()
@@ -1,7 +1,15 @@
-from fastapi import Query
+import base64
+import binascii
+from http import HTTPStatus
+from typing import AsyncGenerator, TypeVar
+
+import orjson
+from fastapi import HTTPException, Query
 
 from src.core.config import config
 
+T = TypeVar("T")
+
 
 class Paginator:
     def __init__(
@@ -11,3 +19,86 @@ class Paginator:
     ):
         self.page_size = page_size
         self.page_number = page_number
+
+
+class CursorPaginator:
+    """Постраничный обход через курсор (search_after) вместо номера страницы.
+
+    Стоимость запроса страницы не растет с ее глубиной и не упирается
+    в max_result_window. Пустой курсор означает первую страницу, курсор
+    следующей страницы возвращается в заголовке X-Next-Cursor.
+    """
+
+    def __init__(
+        self,
+        cursor: str | None = Query(
+            default=None,
+            description="Курсор страницы; пустое значение - первая страница",
+        ),
+    ):
+        self.enabled = cursor is not None
+        self.search_after = decode_cursor(cursor) if cursor else None
+
+
+def encode_cursor(sort_values: list) -> str:
+    return base64.urlsafe_b64encode(orjson.dumps(sort_values)).decode()
+
+
+def decode_cursor(cursor: str) -> list:
+    try:
+        sort_values = orjson.loads(base64.urlsafe_b64decode(cursor))
+    except (binascii.Error, ValueError, orjson.JSONDecodeError):
+        sort_values = None
+
+    if not isinstance(sort_values, list):
+        raise HTTPException(
+            status_code=HTTPStatus.BAD_REQUEST, detail="Некорректный курсор"
+        )
+    return sort_values
+
+
+def apply_search_after(
+    query: dict, search_after: list | None, sort: list[dict] | None = None
+) -> dict:
+    """Перевод запроса к Elasticsearch с from/size на search_after.
+
+    Для однозначного порядка к сортировке добавляется id.
+    """
+
+    query.pop("from", None)
+    query["sort"] = [
+        *(sort if sort is not None else query.get("sort", [])),
+        {"id": "asc"},
+    ]
+    if search_after:
+        query["search_after"] = search_after
+    return query
+
+
+def next_cursor(hits: list[dict], page_size: int) -> str | None:
+    """Курсор следующей страницы по значениям сортировки последнего документа"""
+
+    if len(hits) < page_size:
+        return None
+    return encode_cursor(hits[-1]["sort"])
+
+
+async def paginate_stream(
+    stream: AsyncGenerator[T, None], page_number: int, page_size: int
+) -> list[T]:
+    """Получение одной страницы из асинхронного потока без материализации
+    предшествующих страниц"""
+
+    offset = (page_number - 1) * page_size
+    page = []
+    position = 0
+    try:
+        async for item in stream:
+            if position >= offset:
+                page.append(item)
+                if len(page) == page_size:
+                    break
+            position += 1
+    finally:
+        await stream.aclose()
+    return page
@@ -0,0 +1,162 @@
+"""Профилирование отдельных запросов.
+
+Для профилируемого запроса собирается дерево интервалов (обращения к кешу,
+запросы к Elasticsearch, валидация и сериализация ответа). Дерево отдается
+в заголовке Server-Timing и может записываться в файл. Для остальных запросов
+span() сводится к чтению одной контекстной переменной.
+"""
+
+import hashlib
+import hmac
+import random
+import time
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from typing import Any, ContextManager, Iterator
+
+import orjson
+from fastapi import Request, Response
+
+from src.core.config import config
+from src.core.logger import a_api_logger
+
+_NO_SPAN = nullcontext()
+
+_current_span: ContextVar["Span | None"] = ContextVar("current_span", default=None)
+
+
+class Span:
+    def __init__(self, name: str, attrs: dict[str, Any]):
+        self.name = name
+        self.attrs = attrs
+        self.started_at = time.perf_counter()
+        self.duration = 0.0
+        self.children: list[Span] = []
+
+    def to_dict(self, trace_started_at: float) -> dict:
+        return {
+            "name": self.name,
+            "start_ms": round((self.started_at - trace_started_at) * 1000, 3),
+            "duration_ms": round(self.duration * 1000, 3),
+            **({"attrs": self.attrs} if self.attrs else {}),
+            "children": [child.to_dict(trace_started_at) for child in self.children],
+        }
+
+
+def span(name: str, **attrs) -> ContextManager:
+    """Интервал внутри профилируемого запроса; вне его ничего не делает"""
+
+    parent = _current_span.get()
+    if parent is None:
+        return _NO_SPAN
+    return _record_span(parent, name, attrs)
+
+
+def is_profiling() -> bool:
+    return _current_span.get() is not None
+
+
+def body_hash(body: Any) -> str:
+    """Короткий хеш тела запроса, чтобы сопоставлять одинаковые запросы"""
+
+    return hashlib.blake2b(
+        orjson.dumps(body, option=orjson.OPT_SORT_KEYS), digest_size=8
+    ).hexdigest()
+
+
+@contextmanager
+def _record_span(parent: Span, name: str, attrs: dict) -> Iterator[Span]:
+    current = Span(name, attrs)
+    parent.children.append(current)
+    token = _current_span.set(current)
+    try:
+        yield current
+    finally:
+        current.duration = time.perf_counter() - current.started_at
+        _current_span.reset(token)
+
+
+def sign_profiling_token(expires_at: int) -> str:
+    """Токен для заголовка X-Profile-Token, действующий до expires_at"""
+
+    signature = hmac.new(
+        config.profiling_secret.encode(), str(expires_at).encode(), hashlib.sha256
+    ).hexdigest()
+    return f"{expires_at}.{signature}"
+
+
+def _has_valid_token(request: Request) -> bool:
+    token = request.headers.get("x-profile-token")
+    if not token or not config.profiling_secret:
+        return False
+
+    expires_at, _, _ = token.partition(".")
+    if not expires_at.isdigit() or int(expires_at) < time.time():
+        return False
+    return hmac.compare_digest(token, sign_profiling_token(int(expires_at)))
+
+
+def _should_profile(request: Request) -> bool:
+    if config.profiling_enabled and random.random() < config.profiling_sample_rate:
+        return True
+    return _has_valid_token(request)
+
+
+def _server_timing(root: Span) -> str:
+    """Интервалы в формате заголовка Server-Timing в порядке обхода дерева.
+
+    Номер в имени сохраняет порядок, вложенность видна в файле трассировок.
+    """
+
+    entries = []
+    stack = [root]
+    while stack and len(entries) < config.profiling_server_timing_max_entries:
+        current = stack.pop()
+        entry = f"{len(entries)}-{current.name};dur={current.duration * 1000:.2f}"
+        description = current.attrs.get("key") or current.attrs.get("caller")
+        if description:
+            description = str(description)[:80].replace("\\", "").replace('"', "")
+            entry += f';desc="{description}"'
+        entries.append(entry)
+        stack.extend(reversed(current.children))
+    return ", ".join(entries)
+
+
+def _write_trace(request: Request, root: Span) -> None:
+    try:
+        with open(config.profiling_trace_file, "ab") as trace_file:
+            trace_file.write(
+                orjson.dumps(
+                    {
+                        "method": request.method,
+                        "path": request.url.path,
+                        "query": str(request.query_params),
+                        "recorded_at": time.time(),
+                        "trace": root.to_dict(root.started_at),
+                    }
+                )
+                + b"\n"
+            )
+    except OSError as exc:
+        a_api_logger.error(f"Ошибка при записи трассировки запроса: {exc}")
+
+
+async def profiling_middleware(request: Request, call_next) -> Response:
+    """Профилирование запроса, если оно включено в конфигурации
+    или запрос содержит действующий подписанный токен"""
+
+    if not _should_profile(request):
+        return await call_next(request)
+
+    root = Span("request", {"path": request.url.path})
+    token = _current_span.set(root)
+    try:
+        response = await call_next(request)
+    finally:
+        root.duration = time.perf_counter() - root.started_at
+        _current_span.reset(token)
+
+    response.headers["Server-Timing"] = _server_timing(root)
+    if config.profiling_trace_file:
+        _write_trace(request, root)
+    return response
@@ -0,0 +1,18 @@
+from functools import lru_cache
+
+from pydantic import BaseModel
+
+
+@lru_cache
+def source_includes(model: type[BaseModel]) -> list[str]:
+    """Поля _source документа Elasticsearch, нужные для построения модели.
+
+    Поле модели называется так же, как поле документа, либо задано через alias;
+    поле uuid соответствует полю id документа.
+    """
+
+    fields = []
+    for name, field in model.model_fields.items():
+        name = field.alias or name
+        fields.append("id" if name == "uuid" else name)
+    return fields
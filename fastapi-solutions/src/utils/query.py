@@ -0,0 +1,9 @@
+import unicodedata
+
+
+def normalize_query(query: str) -> str:
+    """Приведение поискового запроса к каноническому виду: NFKC, без учета
+    регистра, с одиночными пробелами между словами. Запросы, которые
+    отличаются только этим, дают одинаковый результат поиска и общий ключ кеша"""
+
+    return " ".join(unicodedata.normalize("NFKC", query).casefold().split())
@@ -0,0 +1,124 @@
+import hashlib
+from functools import lru_cache
+from http import HTTPStatus
+from typing import Any, Awaitable, Callable
+from urllib.parse import urlencode
+
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+
+from src.core.config import config
+from src.db.cache import CacheService
+from src.db.invalidation import collect_tags
+from src.models.batch import BatchResponse
+from src.utils.metrics import response_serialization_duration
+from src.utils.profiling import span
+
+
+@lru_cache
+def get_type_adapter(response_model: Any) -> TypeAdapter:
+    return TypeAdapter(response_model)
+
+
+@lru_cache
+def model_name(response_model: Any) -> str:
+    """Короткое имя модели ответа для меток метрик: list[Films], Film"""
+
+    if args := getattr(response_model, "__args__", None):
+        origin = getattr(response_model, "__origin__", response_model)
+        return f"{origin.__name__}[{', '.join(model_name(arg) for arg in args)}]"
+    return getattr(response_model, "__name__", str(response_model))
+
+
+async def cached_json_response(
+    request: Request,
+    cache: CacheService,
+    response_model: Any,
+    build: Callable[[], Awaitable[Any]],
+    params: dict[str, Any] | None = None,
+) -> Response:
+    """Ответ в формате JSON, тело которого кешируется целиком.
+
+    При попадании в кеш байты тела возвращаются как есть, без десериализации
+    и повторной валидации моделями. Тело кешируется через get_or_build, поэтому
+    устаревает, обновляется в фоне и строится под блокировкой так же, как
+    остальные значения кеша. ETag вычисляется по телу ответа.
+
+    Ключ кеша строится по шаблону пути маршрута и уже проверенным параметрам
+    из params (включая параметры пути), а не по URL запроса: лишние параметры
+    и сегменты пути не создают новых ключей.
+    """
+
+    route = request.scope.get("route")
+    cache_key = await cache.cache_key_generation(
+        response=route.path if route else request.url.path,
+        query=urlencode(
+            sorted(
+                (name, str(value))
+                for name, value in (params or {}).items()
+                if value is not None
+            )
+        ),
+    )
+
+    async def build_body() -> tuple[bytes, set[str]]:
+        adapter = get_type_adapter(response_model)
+        value = await build()
+        with response_serialization_duration.labels(
+            model=model_name(response_model)
+        ).time():
+            with span("response.validate"):
+                value = adapter.validate_python(value, from_attributes=True)
+            with span("response.serialize"):
+                body = adapter.dump_json(value)
+        return body, collect_tags(cache.index, value)
+
+    if config.cache_raw_responses:
+        body = await cache.get_or_build(cache_key, response_model, build_body, raw=True)
+    else:
+        body, _ = await build_body()
+
+    etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=HTTPStatus.NOT_MODIFIED, headers={"ETag": etag})
+
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+
+def cursor_json_response(
+    response_model: Any, items: list, next_cursor: str | None
+) -> Response:
+    """Ответ со страницей, полученной по курсору, и курсором следующей страницы"""
+
+    adapter = get_type_adapter(response_model)
+    with response_serialization_duration.labels(
+        model=model_name(response_model)
+    ).time():
+        with span("response.validate"):
+            value = adapter.validate_python(items, from_attributes=True)
+        with span("response.serialize"):
+            body = adapter.dump_json(value)
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+def batch_json_response(
+    response_model: Any, ids: list[str], found: dict[str, Any]
+) -> Response:
+    """Ответ на batch-запрос: найденные объекты в порядке запрошенных id
+    и список id, которые не найдены"""
+
+    batch_model = BatchResponse[response_model]
+    adapter = get_type_adapter(batch_model)
+    with response_serialization_duration.labels(model=model_name(batch_model)).time():
+        with span("response.validate"):
+            value = adapter.validate_python(
+                {
+                    "items": [found[item_id] for item_id in ids if item_id in found],
+                    "not_found": [item_id for item_id in ids if item_id not in found],
+                },
+                from_attributes=True,
+            )
+        with span("response.serialize"):
+            body = adapter.dump_json(value)
+    return Response(content=body, media_type="application/json")
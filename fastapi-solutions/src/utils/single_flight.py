@@ -0,0 +1,31 @@
+import asyncio
+from functools import partial
+from typing import Any, Awaitable, Callable
+
+
+class SingleFlight:
+    """Объединение одновременных вычислений одного и того же значения.
+
+    Пока значение по ключу вычисляется, остальные корутины с тем же ключом
+    не запускают вычисление повторно, а ожидают результат уже запущенного.
+    """
+
+    def __init__(self):
+        self._calls: dict[str, asyncio.Future] = {}
+
+    async def do(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        call = self._calls.get(key)
+        if call is None:
+            call = asyncio.ensure_future(func())
+            self._calls[key] = call
+            call.add_done_callback(partial(self._forget, key))
+
+        # Отмена одного из ожидающих запросов не должна отменять вычисление
+        # для остальных
+        return await asyncio.shield(call)
+
+    def _forget(self, key: str, call: asyncio.Future) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        if not call.cancelled():
+            call.exception()
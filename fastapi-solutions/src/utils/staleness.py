@@ -0,0 +1,36 @@
+from contextvars import ContextVar
+
+from fastapi import Request, Response
+
+# Возраст самых старых устаревших данных, отданных в ответе на текущий запрос.
+# Хранится изменяемый словарь, чтобы отметки из дочерних задач были видны
+# в middleware.
+_stale_data: ContextVar[dict | None] = ContextVar("stale_data", default=None)
+
+
+def mark_stale(age_in_seconds: float) -> None:
+    """Отметка, что в ответе используются устаревшие данные из кеша"""
+
+    stale_data = _stale_data.get()
+    if stale_data is not None:
+        stale_data["age"] = max(stale_data.get("age", 0.0), age_in_seconds)
+
+
+def is_stale() -> bool:
+    stale_data = _stale_data.get()
+    return stale_data is not None and "age" in stale_data
+
+
+async def staleness_middleware(request: Request, call_next) -> Response:
+    """Добавление заголовка X-Stale-Age, если ответ собран из устаревших данных"""
+
+    stale_data = {}
+    token = _stale_data.set(stale_data)
+    try:
+        response = await call_next(request)
+    finally:
+        _stale_data.reset(token)
+
+    if "age" in stale_data:
+        response.headers["X-Stale-Age"] = str(int(stale_data["age"]))
+    return response